@@ -1,5 +1,9 @@
 from django.contrib import admin
 
-from .models import User
+from .models import User, TaskScreenshot, PointsEntry, Category, Subcategory
 
 admin.site.register(User)
+admin.site.register(TaskScreenshot)
+admin.site.register(PointsEntry)
+admin.site.register(Category)
+admin.site.register(Subcategory)
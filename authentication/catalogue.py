@@ -0,0 +1,89 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from .models import Task
+from .pagination import KeysetPage, KeysetPaginator
+
+# The task catalogue only changes when an admin adds, edits or deletes a
+# task, so list pages are cached: the rows of each page and the rendered
+# task cards (through {% cache %} in the templates). Every key embeds the
+# catalogue version, which the Task save/delete signals bump, so a change
+# makes all old entries unreachable at once instead of deleting them.
+# Per-user bits, like the completed marker, are never cached.
+#
+# The cache is the CATALOGUE_CACHE alias in CACHES. The version has to be
+# seen by every worker, so use a shared backend (Redis, Memcached, database)
+# when running more than one process; otherwise other workers only notice
+# a change after CATALOGUE_CACHE_TTL.
+
+CATALOGUE_VERSION_KEY = 'catalogue-version'
+
+
+def get_catalogue_cache():
+    return caches[getattr(settings, 'CATALOGUE_CACHE', 'default')]
+
+
+def _catalogue_cache_ttl():
+    return getattr(settings, 'CATALOGUE_CACHE_TTL', 300)
+
+
+def get_catalogue_version():
+    cache = get_catalogue_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # The version must outlive the entries keyed by it
+        cache.add(CATALOGUE_VERSION_KEY, 1, None)
+        version = cache.get(CATALOGUE_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalogue_version():
+    cache = get_catalogue_cache()
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # Not set yet (or evicted): any fresh value invalidates old keys
+        cache.set(CATALOGUE_VERSION_KEY, 2, None)
+
+
+def catalogue_context():
+    """
+    Template variables for caching task cards with {% cache %}:
+    {% cache catalogue_cache_ttl "name" task.id catalogue_version using=catalogue_cache %}
+    """
+    return {
+        'catalogue_version': get_catalogue_version(),
+        'catalogue_cache': getattr(settings, 'CATALOGUE_CACHE', 'default'),
+        'catalogue_cache_ttl': _catalogue_cache_ttl(),
+    }
+
+
+def get_catalogue_page(token, per_page=5, ordering=('id',), filters=None, search=''):
+    """
+    Return the KeysetPage of the task catalogue that the cursor ``token``
+    points at, from the cache when the catalogue has not changed since.
+    ``filters`` are queryset lookups, e.g. {'category': 'news'}; ``search``
+    narrows the page to every match of the search index.
+    """
+    filters = filters or {}
+    queryset = Task.objects.filter(**filters)
+    if search:
+        from .search import search_filter  # search imports this module
+        queryset = queryset.filter(search_filter(search))
+    paginator = KeysetPaginator(queryset, per_page, ordering=ordering, approximate_total=True)
+
+    page_key = repr((tuple(ordering), per_page, token or '', sorted(filters.items()), search))
+    key = 'catalogue:%s:page:%s' % (
+        get_catalogue_version(), hashlib.sha1(page_key.encode('utf-8')).hexdigest()
+    )
+
+    cache = get_catalogue_cache()
+    cached = cache.get(key)
+    if cached is None:
+        page = paginator.page(token)
+        cached = (page.object_list, page.has_next, page.has_previous, page.approximate_total)
+        cache.set(key, cached, _catalogue_cache_ttl())
+
+    object_list, has_next, has_previous, approximate_total = cached
+    paginator._approximate_total = approximate_total
+    return KeysetPage(paginator, object_list, has_next, has_previous)
@@ -0,0 +1,60 @@
+from array import array
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from .catalogue import get_catalogue_cache
+from .models import User
+
+# The IDs of the tasks a user completed are cached as a sorted array of
+# 64-bit ints (8 bytes per task), so list pages can mark completed tasks
+# without a query per task or loading the user's Task rows.
+#
+# Completing a task clears the entry, so it lives in the catalogue cache,
+# which deployments share between workers. When that cache is per process
+# (LocMemCache) other workers never see the clear, so entries only live
+# for LOCAL_CACHE_MAX_TTL seconds there.
+
+LOCAL_CACHE_MAX_TTL = 30
+
+
+def _completed_cache_key(user_id):
+    return f'completed-task-ids:{user_id}'
+
+
+def _completed_cache_ttl(cache):
+    ttl = getattr(settings, 'COMPLETED_TASKS_CACHE_TTL', 3600)
+    if isinstance(cache, LocMemCache):
+        return min(ttl, LOCAL_CACHE_MAX_TTL)
+    return ttl
+
+
+def has_completed_task(user, task_id):
+    """
+    Check a single completion with an indexed lookup on the user/task
+    through table; it never reads the Task rows.
+    """
+    return User.tasks.through.objects.filter(user_id=user.pk, task_id=task_id).exists()
+
+
+def get_completed_task_ids(user):
+    """
+    Return the set of task IDs ``user`` completed, from the cache when
+    possible. Membership tests against it are O(1).
+    """
+    cache = get_catalogue_cache()
+    key = _completed_cache_key(user.pk)
+    packed = cache.get(key)
+    if packed is None:
+        # 'Q' holds BigAutoField IDs, which can exceed 32 bits
+        task_ids = array('Q', sorted(
+            User.tasks.through.objects.filter(user_id=user.pk).values_list('task_id', flat=True)
+        ))
+        packed = task_ids.tobytes()
+        cache.set(key, packed, _completed_cache_ttl(cache))
+
+    task_ids = array('Q')
+    task_ids.frombytes(packed)
+    return frozenset(task_ids)
+
+
+def invalidate_completed_tasks(user_id):
+    get_catalogue_cache().delete(_completed_cache_key(user_id))
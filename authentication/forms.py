@@ -1,6 +1,8 @@
 from django import forms 
 from django.core.exceptions import ValidationError
+from urllib.parse import urlencode
 from .models import User
+from .taxonomy import get_category_choices, get_subcategories, is_valid_subcategory
 from django.contrib.auth.hashers import make_password, check_password
 
 class UserLoginForm(forms.Form):
@@ -55,4 +57,81 @@ class UserSignupForm(forms.Form):
 
 
 class TaskScreenshotForm(forms.Form):
-    image = forms.ImageField(label=(""), required=True)
\ No newline at end of file
+    image = forms.ImageField(label=(""), required=True)
+
+
+class TaskFilterForm(forms.Form):
+    """
+    Filters and sort order of the applist page, read from the query string.
+    Every combination is served by one of the Task indexes: category and
+    subcategory are equality filters on the leading columns, points is a
+    range on the next one. The search query is applied separately, see
+    get_search. Invalid values are ignored.
+    """
+    SORT_CHOICES = [
+        ("", "Default"),
+        ("newest", "Newest"),
+        ("points", "Most points"),
+        ("points_asc", "Fewest points"),
+    ]
+    SORT_ORDERINGS = {
+        "": ["id"],
+        "newest": ["-id"],
+        "points": ["-points", "-id"],
+        "points_asc": ["points", "id"],
+    }
+
+    q = forms.CharField(required=False, max_length=100)
+    category = forms.ChoiceField(required=False)
+    subcategory = forms.CharField(required=False, max_length=100)
+    min_points = forms.IntegerField(required=False, min_value=0)
+    max_points = forms.IntegerField(required=False, min_value=0)
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["category"].choices = [("", "All categories")] + get_category_choices()
+
+    def clean_subcategory(self):
+        subcategory = self.cleaned_data.get("subcategory")
+        category = self.cleaned_data.get("category")
+        # Only meaningful within a category (the index starts with it)
+        if subcategory and not (category and is_valid_subcategory(category, subcategory)):
+            raise ValidationError("Unknown subcategory for the selected category")
+        return subcategory
+
+    @property
+    def subcategory_choices(self):
+        """
+        Subcategories of the selected category, for the dropdown.
+        """
+        return get_subcategories(self._valid_data().get("category", ""))
+
+    def _valid_data(self):
+        self.is_valid()
+        return {name: value for name, value in self.cleaned_data.items() if value not in (None, "")}
+
+    def get_filters(self):
+        data = self._valid_data()
+        filters = {}
+        if "category" in data:
+            filters["category"] = data["category"]
+            if "subcategory" in data:
+                filters["subcategory"] = data["subcategory"]
+        if "min_points" in data:
+            filters["points__gte"] = data["min_points"]
+        if "max_points" in data:
+            filters["points__lte"] = data["max_points"]
+        return filters
+
+    def get_search(self):
+        return self._valid_data().get("q", "")
+
+    def get_ordering(self):
+        return self.SORT_ORDERINGS[self._valid_data().get("sort", "")]
+
+    def get_query(self):
+        """
+        The valid filters as a query string, for the pagination links.
+        """
+        return urlencode(self._valid_data())
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from authentication.catalogue import bump_catalogue_version
+from authentication.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the task search index, e.g. after bulk imports that skip model signals'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_search_index()
+        if indexed is None:
+            self.stdout.write('The database keeps the search index up to date itself; nothing to do')
+            return
+
+        # Cached search results may predate the rebuild
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} tasks'))
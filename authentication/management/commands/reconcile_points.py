@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from authentication.models import User, PointsEntry
+
+class Command(BaseCommand):
+    help = 'Rebuild every user\'s points balance from the points ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report balances that differ from the ledger'
+        )
+
+    def handle(self, *args, **options):
+        ledger_total = (
+            PointsEntry.objects.filter(user=OuterRef('pk'))
+            .order_by()
+            .values('user')
+            .annotate(total=Sum('delta'))
+            .values('total')
+        )
+        balance = Coalesce(Subquery(ledger_total, output_field=IntegerField()), Value(0))
+
+        with transaction.atomic():
+            mismatched = User.objects.annotate(ledger_points=balance).exclude(points=F('ledger_points'))
+            corrected = 0
+            for email, points, ledger_points in mismatched.values_list('email', 'points', 'ledger_points'):
+                self.stdout.write(f'{email}: {points} -> {ledger_points}')
+                corrected += 1
+
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'Dry run: {corrected} balances differ from the ledger'))
+                return
+
+            # One UPDATE, computed by the database, touching only the
+            # users whose balance is off
+            User.objects.filter(pk__in=mismatched.values('pk')).update(points=balance)
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled points, {corrected} balances corrected'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from authentication.catalogue import bump_catalogue_version
+from authentication.models import Task
+from main.media_backends import get_media_backend, normalize_media_path
+from main.media_versions import media_version
+
+class Command(BaseCommand):
+    help = 'Record the content version of every task logo and logo variant saved before versions were recorded'
+
+    def handle(self, *args, **options):
+        backend = get_media_backend()
+        updated = []
+        for task in Task.objects.exclude(logo='').only('id', 'logo', 'logo_variants', 'media_versions'):
+            names = [task.logo.name] + [
+                name for sizes in (task.logo_variants or {}).values() for name in sizes.values()
+            ]
+            missing = [name for name in names if name not in (task.media_versions or {})]
+            if not missing:
+                continue
+
+            # One metadata-only batch read per task
+            metadata = backend.stat_many([normalize_media_path(name) for name in missing])
+            versions = dict(task.media_versions or {})
+            for name in missing:
+                version = media_version((metadata.get(normalize_media_path(name)) or {}).get('sha256'))
+                if version:
+                    versions[name] = version
+            if versions != task.media_versions:
+                task.media_versions = versions
+                updated.append(task)
+
+        Task.objects.bulk_update(updated, ['media_versions'], batch_size=500)
+        if updated:
+            # bulk_update sends no signals; cached task cards embed the URLs
+            bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f'Recorded media versions for {len(updated)} tasks'))
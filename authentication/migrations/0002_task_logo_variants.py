@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='logo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
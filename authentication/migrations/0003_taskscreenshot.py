@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_task_logo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskScreenshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=255)),
+                ('original_size', models.PositiveIntegerField()),
+                ('processed_size', models.PositiveIntegerField()),
+                ('uploaded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='screenshots', to='authentication.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='screenshots', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_taskscreenshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='logo',
+            field=models.ImageField(upload_to='applogo/'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Seed the ledger from completed tasks, plus one adjustment per user for
+    whatever part of the current balance those do not explain, so that
+    reconcile_points leaves every existing balance unchanged.
+    """
+    User = apps.get_model('authentication', 'User')
+    PointsEntry = apps.get_model('authentication', 'PointsEntry')
+    Completion = User.tasks.through
+
+    entries = []
+    explained = {}
+    for user_id, task_id, task_points in Completion.objects.values_list('user_id', 'task_id', 'task__points').iterator():
+        entries.append(PointsEntry(user_id=user_id, task_id=task_id, delta=task_points, reason='task_completed'))
+        explained[user_id] = explained.get(user_id, 0) + task_points
+
+    for user_id, points in User.objects.values_list('id', 'points').iterator():
+        difference = points - explained.get(user_id, 0)
+        if difference:
+            entries.append(PointsEntry(user_id=user_id, delta=difference, reason='adjustment'))
+
+    PointsEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_alter_task_logo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('task_completed', 'Task completed'), ('adjustment', 'Adjustment')], max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='points_entries', to='authentication.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pointsentry',
+            constraint=models.UniqueConstraint(fields=('user', 'task'), name='unique_points_entry_per_task'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
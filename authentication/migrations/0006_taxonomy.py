@@ -0,0 +1,100 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The taxonomy that used to be hard-coded in Task.get_available_subcategories
+TAXONOMY = [
+    ("social networking", "Social Networking", [
+        "Messaging", "Social Media", "Dating", "Professional Networking",
+    ]),
+    ("entertainment", "Entertainment", [
+        "Video Streaming", "Music Streaming", "Gaming", "Live Streaming", "Ticket Booking",
+    ]),
+    ("utilities", "Utilities", [
+        "Weather", "Calculator", "File Management", "Translation", "QR Code Scanner",
+    ]),
+    ("productivity", "Productivity", [
+        "Note-taking", "Task Management", "Document Editing", "Calendar", "Email",
+    ]),
+    ("health and fitness", "Health and Fitness", [
+        "Diet Tracking", "Meditation", "Yoga", "Sleep Tracking",
+    ]),
+    ("finance", "Finance", [
+        "Banking", "Expense Tracking", "Investment", "Budgeting", "Tax Filing",
+    ]),
+    ("shopping", "Shopping", [
+        "E-commerce", "Grocery Delivery", "Coupon and Deals", "Fashion", "Second-hand Goods",
+    ]),
+    ("news", "News", [
+        "General News", "Tech News", "Sports News", "Finance News", "Local News",
+    ]),
+    ("lifestyle", "Lifestyle", [
+        "Food and Drink", "Home Decor", "Fashion and Beauty", "Dating", "Horoscopes",
+    ]),
+]
+
+
+def load_taxonomy(apps, schema_editor):
+    Category = apps.get_model('authentication', 'Category')
+    Subcategory = apps.get_model('authentication', 'Subcategory')
+
+    subcategories = []
+    for position, (name, label, names) in enumerate(TAXONOMY):
+        category = Category.objects.create(name=name, label=label, position=position)
+        subcategories.extend(
+            Subcategory(category=category, name=subcategory, position=index)
+            for index, subcategory in enumerate(names)
+        )
+    Subcategory.objects.bulk_create(subcategories)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_pointsentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('label', models.CharField(max_length=100)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['position', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Subcategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subcategories', to='authentication.category')),
+            ],
+            options={
+                'verbose_name_plural': 'subcategories',
+                'ordering': ['category', 'position', 'name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(fields=('category', 'name'), name='unique_subcategory_per_category'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='category',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'subcategory'], name='task_category_subcategory_idx'),
+        ),
+        migrations.RunPython(load_taxonomy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_taxonomy'),
+    ]
+
+    operations = [
+        # Superseded by task_subcategory_id_idx, which has it as a prefix
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_category_subcategory_idx',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['points', 'id'], name='task_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'points', 'id'], name='task_category_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'subcategory', 'points', 'id'], name='task_subcategory_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'id'], name='task_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['category', 'subcategory', 'id'], name='task_subcategory_id_idx'),
+        ),
+    ]
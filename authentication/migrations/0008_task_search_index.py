@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:05
+
+from django.db import migrations
+
+
+# Search columns and indexes depend on the database; see authentication.search
+POSTGRESQL_FORWARDS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE authentication_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    " setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||"
+    " setweight(to_tsvector('simple', coalesce(category, '') || ' ' || coalesce(subcategory, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX task_search_vector_idx ON authentication_task USING GIN (search_vector)",
+    "CREATE INDEX task_name_trgm_idx ON authentication_task USING GIN (name gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARDS = [
+    "DROP INDEX IF EXISTS task_name_trgm_idx",
+    "DROP INDEX IF EXISTS task_search_vector_idx",
+    "ALTER TABLE authentication_task DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARDS = [
+    # prefix='2 3' adds prefix indexes so short typeahead prefixes are cheap
+    "CREATE VIRTUAL TABLE authentication_task_fts USING fts5("
+    " name, category, subcategory, tokenize = 'unicode61', prefix = '2 3')",
+    "INSERT INTO authentication_task_fts (rowid, name, category, subcategory)"
+    " SELECT id, name, category, subcategory FROM authentication_task",
+]
+SQLITE_BACKWARDS = [
+    "DROP TABLE IF EXISTS authentication_task_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_FORWARDS
+    elif vendor == 'sqlite':
+        statements = SQLITE_FORWARDS
+    else:
+        return
+
+    try:
+        for statement in statements:
+            schema_editor.execute(statement)
+    except Exception as e:
+        if vendor != 'sqlite':
+            raise
+        # SQLite built without FTS5: search falls back to icontains
+        print(f"Could not create the task search index: {str(e)}")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_BACKWARDS
+    elif vendor == 'sqlite':
+        statements = SQLITE_BACKWARDS
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_task_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -5,7 +5,8 @@ from django.contrib.auth.models import (
     Group,
     Permission,
 )
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.utils import timezone
 # from django.contrib.postgres.fields import ArrayField
 
@@ -26,99 +27,97 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", True)
         return self.create_user(email, password, **extra_fields)
 
-class Task(models.Model):
-    CATEGORY_CHOICES = [
-        ("social networking", "Social Networking"),
-        ("entertainment", "Entertainment"),
-        ("utilities", "Utilities"),
-        ("productivity", "Productivity"),
-        ("health and fitness", "Health and Fitness"),
-        ("finance", "Finance"),
-        ("shopping", "Shopping"),
-        ("news", "News"),
-        ("lifestyle", "Lifestyle"),
-    ]
+class Category(models.Model):
+    """
+    Task category. ``name`` is the value stored on Task.category.
+    Categories and subcategories are read through authentication.taxonomy,
+    which keeps them in memory.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    label = models.CharField(max_length=100)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'name']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.label
+
+
+class Subcategory(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='subcategories')
+    name = models.CharField(max_length=100)
+    position = models.PositiveSmallIntegerField(default=0)
 
+    class Meta:
+        ordering = ['category', 'position', 'name']
+        verbose_name_plural = 'subcategories'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'name'], name='unique_subcategory_per_category'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
     name = models.CharField(max_length=255, unique=True)
     link = models.CharField(max_length=400)
-    category = models.CharField(choices=CATEGORY_CHOICES, max_length=100)
+    category = models.CharField(max_length=100)
     subcategory = models.CharField(max_length=100, blank=True)
     points = models.IntegerField()
-    logo = models.ImageField()
+    logo = models.ImageField(upload_to='applogo/')
+    # Resized copies of the logo by format and size, see generate_logo_variants
+    logo_variants = models.JSONField(default=dict, blank=True)
+    # Content version of the logo and each variant by stored name, recorded
+    # when they are saved, so building their URLs never asks the backend
+    media_versions = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        # One index per applist filter/sort combination (TaskFilterForm):
+        # equality columns first, then the points range/sort, then id to
+        # break ties. Equality filters and the points sorts are a single
+        # index range scan. A points range sorted by id (default, newest)
+        # cannot be: no index orders both, so the planner either walks the
+        # table in id order filtering points, or scans the range and sorts
+        # it (SQLite: USE TEMP B-TREE FOR ORDER BY)
+        indexes = [
+            models.Index(fields=['points', 'id'], name='task_points_idx'),
+            models.Index(fields=['category', 'points', 'id'], name='task_category_points_idx'),
+            models.Index(fields=['category', 'subcategory', 'points', 'id'], name='task_subcategory_points_idx'),
+            models.Index(fields=['category', 'id'], name='task_category_id_idx'),
+            models.Index(fields=['category', 'subcategory', 'id'], name='task_subcategory_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        from .taxonomy import is_valid_subcategory
+
         if self.category and self.subcategory:
-            if self.subcategory not in Task.get_available_subcategories(self.category):
+            if not is_valid_subcategory(self.category, self.subcategory):
                 raise ValueError("Invalid subcategory for the selected category")
         super().save(*args, **kwargs)
 
+    def media_url(self, name):
+        """
+        URL of the logo or one of its variants, versioned when the version
+        was recorded.
+        """
+        storage = self.logo.storage
+        version = (self.media_versions or {}).get(name)
+        if version and hasattr(storage, 'versioned_url'):
+            return storage.versioned_url(name, version)
+        return storage.url(name)
+
+    @property
+    def logo_url(self):
+        return self.media_url(self.logo.name)
+
     @staticmethod
     def get_available_subcategories(category):
-        subcategories = {
-            "social networking": [
-                "Messaging",
-                "Social Media",
-                "Dating",
-                "Professional Networking",
-            ],
-            "entertainment": [
-                "Video Streaming",
-                "Music Streaming",
-                "Gaming",
-                "Live Streaming",
-                "Ticket Booking",
-            ],
-            "utilities": [
-                "Weather",
-                "Calculator",
-                "File Management",
-                "Translation",
-                "QR Code Scanner",
-            ],
-            "productivity": [
-                "Note-taking",
-                "Task Management",
-                "Document Editing",
-                "Calendar",
-                "Email",
-            ],
-            "health and fitness": [
-                "Diet Tracking",
-                "Meditation",
-                "Yoga",
-                "Sleep Tracking",
-            ],
-            "finance": [
-                "Banking",
-                "Expense Tracking",
-                "Investment",
-                "Budgeting",
-                "Tax Filing",
-            ],
-            "shopping": [
-                "E-commerce",
-                "Grocery Delivery",
-                "Coupon and Deals",
-                "Fashion",
-                "Second-hand Goods",
-            ],
-            "news": [
-                "General News",
-                "Tech News",
-                "Sports News",
-                "Finance News",
-                "Local News",
-            ],
-            "lifestyle": [
-                "Food and Drink",
-                "Home Decor",
-                "Fashion and Beauty",
-                "Dating",
-                "Horoscopes",
-            ],
-        }
-        return subcategories.get(category, [])
+        from .taxonomy import get_subcategories
+
+        return list(get_subcategories(category))
 
 class User(AbstractBaseUser, PermissionsMixin):
     fname = models.CharField(max_length=50, null=False)
@@ -153,4 +152,68 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ["fname", "lname"]
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+class TaskScreenshot(models.Model):
+    """
+    Proof screenshot uploaded by a user for a task, with the size it had
+    before and after normalize_screenshot processed it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='screenshots')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='screenshots')
+    image = models.CharField(max_length=255)
+    original_size = models.PositiveIntegerField()
+    processed_size = models.PositiveIntegerField()
+    uploaded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.image
+
+class PointsEntry(models.Model):
+    """
+    Append-only ledger of point awards. User.points is the running balance
+    of these entries; reconcile_points rebuilds it from the ledger.
+    """
+    TASK_COMPLETED = "task_completed"
+    ADJUSTMENT = "adjustment"
+    REASON_CHOICES = [
+        (TASK_COMPLETED, "Task completed"),
+        (ADJUSTMENT, "Adjustment"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_entries')
+    # Kept when the task is deleted so balances still add up
+    task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='points_entries')
+    delta = models.IntegerField()
+    reason = models.CharField(choices=REASON_CHOICES, max_length=50)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # A task pays out at most once per user
+            models.UniqueConstraint(fields=['user', 'task'], name='unique_points_entry_per_task'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.delta:+d} ({self.reason})"
+
+    @staticmethod
+    def award_task(user, task):
+        """
+        Record the completion of ``task`` by ``user`` and add its points to
+        the balance with a single UPDATE ... SET points = points + n, all in
+        one transaction. Returns False when the task was already rewarded.
+        """
+        from .completed_tasks import invalidate_completed_tasks
+
+        try:
+            with transaction.atomic():
+                PointsEntry.objects.create(
+                    user=user, task=task, delta=task.points, reason=PointsEntry.TASK_COMPLETED
+                )
+                User.objects.filter(pk=user.pk).update(points=F('points') + task.points)
+                user.tasks.add(task)
+                transaction.on_commit(lambda: invalidate_completed_tasks(user.pk))
+        except IntegrityError:
+            return False
+        return True
@@ -0,0 +1,220 @@
+import json
+import base64
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+
+# Keyset ("cursor") pagination. Instead of OFFSET n, each page continues
+# from the sort key of the last row shown (WHERE (a, id) > (x, y)), so every
+# page costs one indexed range scan of per_page + 1 rows however deep it is,
+# and no COUNT(*) is run unless an approximate total is asked for.
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """
+    One page of results. Iterates over its objects; ``next_token`` and
+    ``previous_token`` are the cursors of the neighbouring pages (None at
+    either end) and ``first_token``/``last_token`` jump to the ends.
+    """
+
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def next_token(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_token(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], BACKWARD)
+
+    @property
+    def first_token(self):
+        return ''
+
+    @property
+    def last_token(self):
+        return self.paginator.encode_cursor(None, BACKWARD)
+
+    @property
+    def approximate_total(self):
+        return self.paginator.approximate_total
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, a list of field names with an
+    optional '-' prefix for descending order. The ordering must end in a
+    unique, non-null field; ``id`` is appended when it is missing so ties
+    are broken deterministically. Ordering fields should be non-null and
+    covered by an index whose column order matches ``ordering``.
+
+    With ``approximate_total`` the page reports an estimate of the number
+    of rows: the planner's row estimate on PostgreSQL, elsewhere an exact
+    count cached for APPROXIMATE_COUNT_CACHE_TTL seconds.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('id',), approximate_total=False):
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = [name.startswith('-') for name in ordering]
+        self.with_total = approximate_total
+
+    def encode_cursor(self, obj, direction):
+        key = [getattr(obj, field) for field in self.fields] if obj is not None else None
+        payload = json.dumps({'d': direction, 'k': key}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            direction, key = payload['d'], payload['k']
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor(f"Invalid page cursor: {token!r}")
+
+        if direction not in (FORWARD, BACKWARD):
+            raise InvalidCursor(f"Invalid page cursor: {token!r}")
+        if key is None:
+            return direction, None
+        if not isinstance(key, list) or len(key) != len(self.fields):
+            raise InvalidCursor(f"Invalid page cursor: {token!r}")
+
+        # Turn the JSON values back into what the fields compare against
+        model = self.queryset.model
+        try:
+            key = [
+                model._meta.get_field('id' if field == 'pk' else field).to_python(value)
+                for field, value in zip(self.fields, key)
+            ]
+        except Exception:
+            raise InvalidCursor(f"Invalid page cursor: {token!r}")
+        return direction, key
+
+    def _after(self, key, backward):
+        """
+        Build the condition for rows strictly after ``key`` in the sort
+        order (before it when ``backward``):
+        a > x OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for field, descending, value in zip(self.fields, self.descending, key):
+            lookup = 'lt' if descending != backward else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+
+        if len(self.fields) > 1:
+            # The same bound on the first column alone (a >= x) is implied,
+            # but lets the database turn the OR into an index range scan
+            lookup = 'lte' if self.descending[0] != backward else 'gte'
+            condition &= Q(**{f'{self.fields[0]}__{lookup}': key[0]})
+        return condition
+
+    def _fetch(self, key, backward):
+        queryset = self.queryset
+        if key is not None:
+            queryset = queryset.filter(self._after(key, backward))
+
+        if backward:
+            ordering = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+        else:
+            ordering = self.ordering
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+        return rows, more
+
+    def page(self, token=None):
+        """
+        Return the page the cursor ``token`` points at; no token (or an
+        invalid one) gives the first page.
+        """
+        try:
+            direction, key = self.decode_cursor(token) if token else (FORWARD, None)
+        except InvalidCursor:
+            direction, key = FORWARD, None
+
+        if direction == FORWARD:
+            rows, has_next = self._fetch(key, backward=False)
+            if not rows and key is not None:
+                # Past the end, e.g. the remaining rows were deleted
+                return self.page(self.encode_cursor(None, BACKWARD))
+            return KeysetPage(self, rows, has_next, has_previous=key is not None)
+
+        rows, has_previous = self._fetch(key, backward=True)
+        if not rows and key is not None:
+            return self.page(None)
+        return KeysetPage(self, rows, has_next=key is not None, has_previous=has_previous)
+
+    @property
+    def approximate_total(self):
+        if not self.with_total:
+            return None
+        if not hasattr(self, '_approximate_total'):
+            self._approximate_total = approximate_count(self.queryset)
+        return self._approximate_total
+
+
+def approximate_count(queryset):
+    """
+    Estimate the number of rows in ``queryset`` without a full COUNT(*)
+    where the database allows it.
+    """
+    connection = connections[queryset.db]
+    try:
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        # e.g. pk__in=[]: nothing can match
+        return 0
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    key = 'approximate-count:' + hashlib.sha1(repr((sql, params)).encode('utf-8')).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, getattr(settings, 'APPROXIMATE_COUNT_CACHE_TTL', 60))
+    return count
@@ -0,0 +1,188 @@
+import re
+import hashlib
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .catalogue import get_catalogue_cache, get_catalogue_version
+from .models import Task
+
+# Task search over name, category and subcategory, backed by an index the
+# database maintains per row instead of a LIKE scan:
+#
+# - PostgreSQL: a generated ``search_vector`` tsvector column with a GIN
+#   index, plus a pg_trgm GIN index on name for substring matches. Both are
+#   updated by PostgreSQL itself on every insert/update.
+# - SQLite: the FTS5 table authentication_task_fts (rowid = task id), kept
+#   in step by the Task signals (index_task/unindex_task). Run
+#   rebuild_search_index after writes that skip signals (bulk_create,
+#   queryset.update).
+# - Anything else, or SQLite without FTS5: icontains.
+#
+# Every search term is matched as a prefix, so partial words work for
+# typeahead. search_task_ids returns the best matches in rank order (cached
+# per catalogue version); search_filter matches every task, as a subquery
+# the list pages combine with their other filters and keyset pagination.
+
+FTS_TABLE = 'authentication_task_fts'
+
+# Ignore the rest of very long queries
+MAX_SEARCH_TERMS = 8
+
+_has_fts_table = None
+
+
+def search_terms(query):
+    return re.findall(r'\w+', (query or '').lower())[:MAX_SEARCH_TERMS]
+
+
+def _fts_available():
+    global _has_fts_table
+    if connection.vendor != 'sqlite':
+        return False
+    if not _has_fts_table:
+        # Only a hit is remembered: the table may be created by a later
+        # migrate in this process (e.g. the test database)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _has_fts_table = cursor.fetchone() is not None
+    return _has_fts_table
+
+
+def _tsquery(terms):
+    # 'term1:* & term2:*' -- \w+ terms need no escaping in tsquery syntax
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _like_pattern(query):
+    return '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _fts_match(terms):
+    # "term1"* "term2"* -- every term, as a prefix
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+POSTGRESQL_MATCH = "search_vector @@ to_tsquery('simple', %s) OR name ILIKE %s"
+
+
+def _fallback_condition(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(category__icontains=term) | Q(subcategory__icontains=term)
+    return condition
+
+
+def _search_postgresql(terms, query, limit):
+    tsquery = _tsquery(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM authentication_task WHERE {POSTGRESQL_MATCH}"
+            " ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC,"
+            " similarity(name, %s) DESC, id"
+            " LIMIT %s",
+            [tsquery, _like_pattern(query), tsquery, query, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_sqlite(terms, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [_fts_match(terms), limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_fallback(terms, limit):
+    return list(Task.objects.filter(_fallback_condition(terms)).order_by('id').values_list('id', flat=True)[:limit])
+
+
+def search_filter(query):
+    """
+    Return a Q object matching every task that matches ``query``, with no
+    limit on the number of matches. On PostgreSQL and SQLite FTS5 it is a
+    subquery against the search index.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return Q(pk__in=[])
+
+    query = query.strip()
+    if connection.vendor == 'postgresql':
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM authentication_task WHERE {POSTGRESQL_MATCH}",
+            [_tsquery(terms), _like_pattern(query)]
+        ))
+    if _fts_available():
+        return Q(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts_match(terms)]
+        ))
+    return _fallback_condition(terms)
+
+
+def search_task_ids(query, limit=None):
+    """
+    Return the IDs of the tasks matching ``query``, best match first, at
+    most ``limit`` (SEARCH_MAX_RESULTS) of them. For typeahead; list pages
+    filter with search_filter instead.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+
+    cache = get_catalogue_cache()
+    key = 'catalogue:%s:search:%s' % (
+        get_catalogue_version(), hashlib.sha1(repr((terms, query.strip(), limit)).encode('utf-8')).hexdigest()
+    )
+    task_ids = cache.get(key)
+    if task_ids is None:
+        if connection.vendor == 'postgresql':
+            task_ids = _search_postgresql(terms, query.strip(), limit)
+        elif _fts_available():
+            task_ids = _search_sqlite(terms, limit)
+        else:
+            task_ids = _search_fallback(terms, limit)
+        cache.set(key, task_ids, getattr(settings, 'CATALOGUE_CACHE_TTL', 300))
+    return task_ids
+
+
+def index_task(task):
+    """
+    Add or refresh one task in the SQLite FTS table. PostgreSQL keeps its
+    search columns up to date by itself.
+    """
+    if not _fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [task.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, category, subcategory) VALUES (%s, %s, %s, %s)",
+            [task.pk, task.name, task.category, task.subcategory]
+        )
+
+
+def unindex_task(task_id):
+    if not _fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [task_id])
+
+
+def rebuild_search_index():
+    """
+    Refill the SQLite FTS table from the task table. Returns the number of
+    indexed tasks, or None when the database maintains the index itself.
+    """
+    if not _fts_available():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, category, subcategory)"
+            " SELECT id, name, category, subcategory FROM authentication_task"
+        )
+        return cursor.rowcount
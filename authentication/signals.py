@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .catalogue import bump_catalogue_version
+from .models import Task, Category, Subcategory
+from .search import index_task, unindex_task
+from .taxonomy import invalidate_taxonomy
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, **kwargs):
+    # Cached list pages and task cards are keyed by the catalogue version.
+    # Bump it after commit, or a request could cache the old rows under
+    # the new version
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Task)
+def task_saved_index(sender, instance, **kwargs):
+    # Same transaction as the save, so the search index never drifts
+    index_task(instance)
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted_index(sender, instance, **kwargs):
+    unindex_task(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+def taxonomy_changed(sender, **kwargs):
+    # Every process keeps the taxonomy in memory, see authentication.taxonomy
+    transaction.on_commit(invalidate_taxonomy)
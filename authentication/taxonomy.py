@@ -0,0 +1,104 @@
+import time
+import threading
+from django.conf import settings
+from .catalogue import get_catalogue_cache
+from .models import Category, Subcategory
+
+# The category/subcategory taxonomy is read on every Task.save and by every
+# form and filter, but edited only through the admin. It is loaded from the
+# database once per process and kept in memory, so validating a task during
+# a bulk import is a dict and set lookup.
+#
+# Edits clear the copy of the process that made them right away and bump a
+# version in the catalogue cache; other processes compare their copy with
+# that version at most every TAXONOMY_CHECK_INTERVAL seconds.
+
+TAXONOMY_VERSION_KEY = 'taxonomy-version'
+
+_taxonomy = None
+_taxonomy_lock = threading.Lock()
+
+
+class Taxonomy:
+    """
+    In-memory snapshot of the taxonomy, in display order.
+    """
+
+    def __init__(self, version, categories, subcategories):
+        self.version = version
+        self.checked_at = time.monotonic()
+        # [(name, label)]
+        self.categories = categories
+        # {category name: (subcategory name, ...)}
+        self.subcategories = subcategories
+        self.subcategory_sets = {name: frozenset(names) for name, names in subcategories.items()}
+
+    def as_dict(self):
+        return {name: list(self.subcategories.get(name, ())) for name, label in self.categories}
+
+
+def _shared_version():
+    return get_catalogue_cache().get(TAXONOMY_VERSION_KEY, 0)
+
+
+def _load():
+    version = _shared_version()
+    categories = list(Category.objects.values_list('name', 'label'))
+    subcategories = {name: [] for name, label in categories}
+    for category, name in Subcategory.objects.values_list('category__name', 'name'):
+        subcategories[category].append(name)
+    return Taxonomy(version, categories, {name: tuple(names) for name, names in subcategories.items()})
+
+
+def get_taxonomy():
+    """
+    Return the process-wide Taxonomy, loading it on first use and after it
+    changed.
+    """
+    global _taxonomy
+    taxonomy = _taxonomy
+    interval = getattr(settings, 'TAXONOMY_CHECK_INTERVAL', 30)
+    if taxonomy is not None and time.monotonic() - taxonomy.checked_at < interval:
+        return taxonomy
+
+    with _taxonomy_lock:
+        taxonomy = _taxonomy
+        if taxonomy is not None and time.monotonic() - taxonomy.checked_at >= interval:
+            if _shared_version() == taxonomy.version:
+                taxonomy.checked_at = time.monotonic()
+            else:
+                taxonomy = None
+        if taxonomy is None:
+            taxonomy = _taxonomy = _load()
+    return taxonomy
+
+
+def invalidate_taxonomy():
+    """
+    Drop the in-memory taxonomy here and tell the other processes to
+    reload theirs.
+    """
+    global _taxonomy
+    cache = get_catalogue_cache()
+    try:
+        cache.incr(TAXONOMY_VERSION_KEY)
+    except ValueError:
+        cache.set(TAXONOMY_VERSION_KEY, 1, None)
+    with _taxonomy_lock:
+        _taxonomy = None
+
+
+def get_category_choices():
+    return get_taxonomy().categories
+
+
+def get_subcategories(category):
+    return get_taxonomy().subcategories.get(category, ())
+
+
+def is_valid_category(category):
+    return category in get_taxonomy().subcategory_sets
+
+
+def is_valid_subcategory(category, subcategory):
+    return subcategory in get_taxonomy().subcategory_sets.get(category, ())
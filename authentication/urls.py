@@ -1,7 +1,7 @@
 from django.conf import settings
 from django.urls import path
 from django.conf.urls.static import static
-from .views import signout, signin, signup, profile, index, applist, points, task, adminaddApp, adminHome, taskDetails, deleteTask, alreadyDone
+from .views import signout, signin, signup, profile, index, applist, points, task, adminaddApp, adminHome, taskDetails, deleteTask, alreadyDone, subcategories, task_search
 from .forms import UserLoginForm, UserLogoutForm, UserSignupForm, TaskScreenshotForm
 
 urlpatterns = [
@@ -17,7 +17,9 @@ urlpatterns = [
     path("adminHome/",adminHome, name="adminHome"),
     path("deleteTask/<int:task_id>/",deleteTask, name="deleteTask"),
     path("task/<int:task_id>/",taskDetails, name="taskDetails"),
-    path("alreadyDone/", alreadyDone , name ="alreadyDone")
+    path("alreadyDone/", alreadyDone , name ="alreadyDone"),
+    path("subcategories/", subcategories, name="subcategories"),
+    path("search/", task_search, name="task_search")
 ] 
 
 
@@ -1,20 +1,29 @@
 import os
 from urllib.parse import urljoin
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import redirect, render, get_object_or_404
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
-from .forms import UserLoginForm, UserLogoutForm, UserSignupForm, TaskScreenshotForm
-from .models import User, Task
+from .forms import UserLoginForm, UserLogoutForm, UserSignupForm, TaskScreenshotForm, TaskFilterForm
+from .models import User, Task, TaskScreenshot, PointsEntry
 from django.contrib.auth.hashers import make_password, check_password
 from uuid import uuid4
 from django.core.exceptions import ValidationError
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from .decorators import admin_required
+from .completed_tasks import has_completed_task, get_completed_task_ids
+from .pagination import KeysetPaginator
+from .catalogue import get_catalogue_page, catalogue_context
+from .taxonomy import get_taxonomy
+from .search import search_task_ids
 from main.forms import AdminTaskForm
+from main.media_processing import generate_logo_variants, normalize_screenshot
+from main.media_versions import file_media_version
 
 
 def index(request):
@@ -111,18 +120,27 @@ def profile(request, email):
 
 @login_required
 def applist(request):
-    tasks = Task.objects.all().order_by('id')
-    paginator = Paginator(tasks, 5)
-
-    page = request.GET.get("page")
-    try:
-        tasks = paginator.page(page)
-    except PageNotAnInteger:
-        tasks = paginator.page(1)
-    except EmptyPage:
-        tasks = paginator.page(paginator.num_pages)
-
-    return render(request, "user/applist.html", {"tasks": tasks})
+    # Keyset pagination: the page cost does not grow with the catalogue.
+    # Pages are cached until a task is added, edited or deleted
+    filter_form = TaskFilterForm(request.GET)
+    tasks = get_catalogue_page(
+        request.GET.get("cursor"),
+        ordering=filter_form.get_ordering(),
+        filters=filter_form.get_filters(),
+        search=filter_form.get_search(),
+    )
+
+    # Mark the tasks on this page the user already completed
+    completed_task_ids = get_completed_task_ids(request.user)
+    for task in tasks:
+        task.is_completed = task.id in completed_task_ids
+
+    return render(request, "user/applist.html", {
+        "tasks": tasks,
+        "filter_form": filter_form,
+        "filter_query": filter_form.get_query(),
+        **catalogue_context(),
+    })
 
 
 @login_required
@@ -132,17 +150,10 @@ def points(request):
 
 @login_required
 def task(request):
-    userTasks = request.user.tasks.all().order_by('id')
-    paginator = Paginator(userTasks,5)
-    pageNumber = request.GET.get('page')
-    try:
-        tasks = paginator.page(pageNumber)
-    except PageNotAnInteger:
-        tasks = paginator.page(1)
-    except EmptyPage:
-        tasks = paginator.page(paginator.num_pages)
+    userTasks = request.user.tasks.all()
+    paginator = KeysetPaginator(userTasks, 5, ordering=['id'], approximate_total=True)
+    tasks = paginator.page(request.GET.get('cursor'))
 
-    print(userTasks, "hoi hoi")
     return render(request, "user/doneTask.html", {"userTasks": tasks})
 
 
@@ -158,20 +169,26 @@ def adminaddApp(request):
             points = form.cleaned_data["points"]
             logo = form.cleaned_data["logo"]
 
+            # The logo field stores the upload under applogo/ through the
+            # default storage, so the file is written once
             task = form.save(commit=False)
             task.save()
             # print(name, link, category, subcategory, points, logo)
-            print("ureee rruurueureuureurue")
-
-            if "logo" in request.FILES:
-                logo_file = request.FILES["logo"]
-                upload_path = os.path.join(settings.MEDIA_ROOT, "applogo")
-                # os.makedirs(upload_path, exist_ok=True)
-                fs = FileSystemStorage(location=upload_path)
-                filename = fs.save(logo_file.name, logo_file)
-                task.logo = os.path.join("applogo/", filename)
-                print(task.logo)
-                task.save()
+            print(task.logo)
+
+            if logo:
+                # Record the content versions now, so rendering the logo
+                # URLs never has to look them up in the media backend
+                task.media_versions = {task.logo.name: file_media_version(logo)}
+                # Pre-render the small sizes list pages display the logo at
+                try:
+                    task.logo_variants, versions = generate_logo_variants(
+                        logo, task.logo.name, task.logo.storage
+                    )
+                    task.media_versions.update(versions)
+                except Exception as e:
+                    print(f"Error generating logo variants for {task.logo.name}: {str(e)}")
+                task.save(update_fields=["logo_variants", "media_versions"])
 
             return redirect("/accounts/adminHome/")
     else:
@@ -182,18 +199,9 @@ def adminaddApp(request):
 
 @admin_required
 def adminHome(request):
-    tasks = Task.objects.all().order_by('id')
-    paginator = Paginator(tasks, 5)
-
-    page = request.GET.get("page")
-    try:
-        tasks = paginator.page(page)
-    except PageNotAnInteger:
-        tasks = paginator.page(1)
-    except EmptyPage:
-        tasks = paginator.page(paginator.num_pages)
+    tasks = get_catalogue_page(request.GET.get("cursor"))
 
-    return render(request, "admin/adminHome.html", {"tasks": tasks})
+    return render(request, "admin/adminHome.html", {"tasks": tasks, **catalogue_context()})
 
 
 @admin_required
@@ -207,7 +215,7 @@ def deleteTask(request, task_id):
 @login_required
 def taskDetails(request, task_id):
     task = get_object_or_404(Task, pk=task_id)
-    if task in request.user.tasks.all():
+    if has_completed_task(request.user, task.pk):
         return redirect("alreadyDone")
 
     if request.method == "POST":
@@ -225,20 +233,36 @@ def taskDetails(request, task_id):
             screenshot = form.cleaned_data["image"]
             print("Screenshot received:", screenshot)
             
-            # Create screenshots directory if it doesn't exist
-            upload_path = os.path.join(settings.MEDIA_ROOT, "screenshots")
-            os.makedirs(upload_path, exist_ok=True)
-            
-            print("Upload path:", upload_path)
-            fs = FileSystemStorage(location=upload_path)
-            filename = fs.save(screenshot.name, screenshot)
-            print("Saved filename:", filename)
+            # Shrink and recompress before the file reaches the storage backend
+            original_size = screenshot.size
+            if settings.SCREENSHOT_PROCESSING:
+                try:
+                    screenshot, _ = normalize_screenshot(screenshot)
+                except Exception as e:
+                    print(f"Error processing screenshot, storing original: {str(e)}")
             
-            # Add points and mark task as completed
-            request.user.points += task.points 
-            request.user.save()
-            request.user.tasks.add(task)
-            print("Task marked as completed, points added:", task.points)
+            with transaction.atomic():
+                # Add points and mark task as completed first; the ledger
+                # makes a concurrent second submission a no-op, and then
+                # its screenshot is not stored at all
+                if not PointsEntry.award_task(request.user, task):
+                    print("Task already rewarded:", task.pk)
+                    return redirect("alreadyDone")
+                print("Task marked as completed, points added:", task.points)
+
+                # Goes through the default storage backend (write-behind when
+                # MEDIA_WRITE_BEHIND is on, so this returns without waiting on
+                # Firestore). A failed save rolls the award back
+                filename = default_storage.save(os.path.join("screenshots", screenshot.name), screenshot)
+                print("Saved filename:", filename)
+
+                TaskScreenshot.objects.create(
+                    user=request.user,
+                    task=task,
+                    image=filename,
+                    original_size=original_size,
+                    processed_size=screenshot.size,
+                )
             
             return redirect("task")
         else:
@@ -249,6 +273,60 @@ def taskDetails(request, task_id):
 
     return render(request, "user/taskDetails.html", {"task": task, "form": form})
 
+def subcategories(request):
+    """
+    JSON taxonomy for the dependent category/subcategory dropdowns:
+    ?category=<name> gives that category's subcategories, no parameter
+    gives every category. Served from the in-memory taxonomy.
+    """
+    taxonomy = get_taxonomy()
+    category = request.GET.get("category")
+    if category is None:
+        response = JsonResponse({
+            "categories": [
+                {"name": name, "label": label, "subcategories": list(taxonomy.subcategories.get(name, ()))}
+                for name, label in taxonomy.categories
+            ]
+        })
+    elif category in taxonomy.subcategories:
+        response = JsonResponse({"category": category, "subcategories": list(taxonomy.subcategories[category])})
+    else:
+        response = JsonResponse({"category": category, "subcategories": []}, status=404)
+
+    response["Cache-Control"] = "public, max-age=300"
+    return response
+
+@login_required
+def task_search(request):
+    """
+    JSON task search for typeahead: ?q=<text>&limit=<n>. Every word is
+    matched as a prefix of the task name, category or subcategory; the
+    best matches come first.
+    """
+    query = request.GET.get("q", "")[:100]
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    task_ids = search_task_ids(query, limit=limit)
+    tasks = Task.objects.in_bulk(task_ids)
+    return JsonResponse({
+        "query": query,
+        "results": [
+            {
+                "id": tasks[task_id].id,
+                "name": tasks[task_id].name,
+                "category": tasks[task_id].category,
+                "subcategory": tasks[task_id].subcategory,
+                "points": tasks[task_id].points,
+                "url": reverse("taskDetails", args=[task_id]),
+            }
+            # The index can be ahead of a task deleted a moment ago
+            for task_id in task_ids if task_id in tasks
+        ],
+    })
+
 @login_required
 def alreadyDone(request):
     return render(request, "user/alreadyDone.html")
\ No newline at end of file
@@ -0,0 +1,21 @@
+# Gunicorn configuration, picked up automatically from the working directory
+
+
+def post_worker_init(worker):
+    """
+    Warm up the per-process media backend (the Firestore client) once the
+    worker has loaded the app, so the first media request does not pay for
+    connection setup, and
+    resume flushing any write-behind uploads left in the spool.
+    """
+    from django.conf import settings
+
+    if getattr(settings, 'DEFAULT_FILE_STORAGE', '') in (
+        'main.firebase_firestore_storage.FirebaseFirestoreStorage',
+        'main.media_storage.MediaBackendStorage',
+    ):
+        from main.media_backends import get_media_backend
+        get_media_backend().warm_up()
+
+        from main.media_spool import get_media_spool
+        get_media_spool()
@@ -14,6 +14,7 @@ from .firebase_config import (
     get_file_from_database,
     delete_file_from_database
 )
+from .media_backends import normalize_media_path
 
 @deconstructible
 class FirebaseDatabaseStorage(Storage):
@@ -31,9 +32,7 @@ class FirebaseDatabaseStorage(Storage):
         """
         Get the full path of the file.
         """
-        if name.startswith('/'):
-            name = name[1:]
-        return name
+        return normalize_media_path(name)
     
     def _open(self, name, mode='rb'):
         """
@@ -0,0 +1,132 @@
+import os
+import asyncio
+import threading
+import weakref
+from firebase_admin import firestore_async
+from .firebase_firestore_config import (
+    MEDIA_BLOB_COLLECTION,
+    MEDIA_METADATA_FIELDS,
+    initialize_firebase,
+    get_document_id,
+    get_chunk_id,
+    decode_file_data
+)
+
+# Async counterparts of the read helpers in firebase_firestore_config, used
+# by the async media view under ASGI. An AsyncClient's gRPC channel belongs
+# to the event loop that created it, so one client is kept per loop (and,
+# like the sync client, rebuilt after fork).
+_async_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+# Get the AsyncClient for the running event loop
+def get_async_firestore_db():
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+
+    cached = _async_clients.get(loop)
+    if cached is not None and cached[0] == pid:
+        return cached[1]
+
+    with _async_client_lock:
+        cached = _async_clients.get(loop)
+        if cached is not None and cached[0] == pid:
+            return cached[1]
+
+        app = initialize_firebase()
+        if not app:
+            return None
+        try:
+            db = firestore_async.AsyncClient(
+                credentials=app.credential.get_credential(),
+                project=app.project_id
+            )
+        except Exception as e:
+            print(f"Error getting async Firestore client: {str(e)}")
+            return None
+        _async_clients[loop] = (pid, db)
+        return db
+
+# Get a reference to a media collection on the async client
+def get_async_media_collection(collection_name='media'):
+    db = get_async_firestore_db()
+    if not db:
+        return None
+    return db.collection(collection_name)
+
+# Get file from Firestore without blocking the event loop
+async def async_get_file_from_firestore(file_path):
+    collection_ref = get_async_media_collection()
+    if not collection_ref:
+        raise IOError(f"Could not get media collection reference for {file_path}")
+
+    # Errors propagate: only a missing document means a missing file
+    doc = await collection_ref.document(get_document_id(file_path)).get()
+    if doc.exists:
+        return doc.to_dict()
+    print(f"File not found in Firestore: {file_path}")
+    return None
+
+# Get file metadata from Firestore without downloading the payload
+async def async_get_file_metadata_from_firestore(file_path):
+    collection_ref = get_async_media_collection()
+    if not collection_ref:
+        raise IOError(f"Could not get media collection reference for {file_path}")
+
+    doc = await collection_ref.document(get_document_id(file_path)).get(
+        field_paths=MEDIA_METADATA_FIELDS
+    )
+    if doc.exists:
+        return doc.to_dict() or {}
+    return None
+
+# Async version of load_file_payload: resolve content-addressed blob references
+async def async_load_file_payload(file_data):
+    if 'blob' not in file_data or 'data' in file_data or file_data.get('chunked'):
+        return file_data
+
+    blob_collection = get_async_media_collection(MEDIA_BLOB_COLLECTION)
+    if not blob_collection:
+        raise IOError(f"Could not get media blob collection reference for {file_data['blob']}")
+
+    blob = await blob_collection.document(file_data['blob']).get()
+    if not blob.exists:
+        raise IOError(f"Missing blob {file_data['blob']} for {file_data.get('path')}")
+
+    payload = dict(file_data)
+    blob_data = blob.to_dict()
+    for field in ('data', 'chunked', 'generation', 'chunk_size', 'chunk_count'):
+        if field in blob_data:
+            payload[field] = blob_data[field]
+    return payload
+
+# Async version of iter_file_chunks: yield the bytes between start and end
+# (inclusive), fetching one chunk document at a time
+async def async_iter_file_chunks(file_path, file_data, start=0, end=None):
+    file_data = await async_load_file_payload(file_data)
+    if end is None:
+        end = file_data.get('size', 0) - 1
+
+    if not file_data.get('chunked'):
+        yield decode_file_data(file_data)[start:end + 1]
+        return
+
+    if file_data.get('blob'):
+        parent = get_async_media_collection(MEDIA_BLOB_COLLECTION)
+        doc_id = file_data['blob']
+    else:
+        parent = get_async_media_collection()
+        doc_id = get_document_id(file_path)
+    if not parent:
+        raise IOError(f"Could not get media collection reference for {file_path}")
+    chunks_ref = parent.document(doc_id).collection('chunks')
+
+    chunk_size = file_data['chunk_size']
+    for index in range(start // chunk_size, end // chunk_size + 1):
+        chunk = await chunks_ref.document(get_chunk_id(file_data['generation'], index)).get()
+        if not chunk.exists:
+            raise IOError(f"Missing chunk {index} of {file_path}")
+
+        chunk_start = index * chunk_size
+        data = bytes(chunk.get('data'))
+        yield data[max(start - chunk_start, 0):end - chunk_start + 1]
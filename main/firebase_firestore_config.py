@@ -1,8 +1,14 @@
 import os
+import uuid
+import threading
 import base64
+import hashlib
 import mimetypes
+from io import BytesIO
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as google_exceptions
+from django.conf import settings
 import re
 
 # Helper function to properly format the Firebase private key
@@ -125,19 +131,47 @@ def initialize_firebase():
             traceback.print_exc()
             return None
 
+# The Firestore client and collection handles are created once per process
+# and reused by every helper below. gRPC channels must not be shared across
+# fork(), so the cache remembers which PID built it and is rebuilt lazily in
+# each forked worker.
+_client_lock = threading.Lock()
+_client_pid = None
+_firestore_db = None
+_collection_refs = {}
+
 # Get a reference to the Firestore database
 def get_firestore_db():
-    # Initialize Firebase
-    app = initialize_firebase()
-    if not app:
-        return None
-    try:
-        # Get Firestore client
-        db = firestore.client()
-        return db
-    except Exception as e:
-        print(f"Error getting Firestore client: {str(e)}")
-        return None
+    global _client_pid, _firestore_db
+    
+    pid = os.getpid()
+    if _firestore_db is not None and _client_pid == pid:
+        return _firestore_db
+    
+    with _client_lock:
+        if _firestore_db is not None and _client_pid == pid:
+            return _firestore_db
+        
+        # Either the first call in this process or we are in a forked child
+        _firestore_db = None
+        _collection_refs.clear()
+        
+        # Initialize Firebase
+        app = initialize_firebase()
+        if not app:
+            return None
+        try:
+            # Build our own client rather than firestore.client(), which is
+            # cached on the app and would hand a forked worker the parent's channel
+            _firestore_db = firestore.Client(
+                credentials=app.credential.get_credential(),
+                project=app.project_id
+            )
+            _client_pid = pid
+            return _firestore_db
+        except Exception as e:
+            print(f"Error getting Firestore client: {str(e)}")
+            return None
         
 # Get a reference to the media collection in Firestore
 def get_media_collection(collection_name='media'):
@@ -145,21 +179,56 @@ def get_media_collection(collection_name='media'):
     if not db:
         return None
     
+    collection_ref = _collection_refs.get(collection_name)
+    if collection_ref is not None:
+        return collection_ref
+    
     try:
         # Get reference to the media collection
         collection_ref = db.collection(collection_name)
+        _collection_refs[collection_name] = collection_ref
         return collection_ref
     except Exception as e:
         print(f"Error getting media collection: {str(e)}")
         return None
 
-# Upload a file to Firestore
-def upload_file_to_firestore(file_path, destination_path):
-    # Get media collection reference
+# Create the Firestore client and open its connection before the first
+# request needs it; called from gunicorn's post_worker_init hook
+def warm_up_firestore():
     collection_ref = get_media_collection()
     if not collection_ref:
-        return None
+        print("Firestore warm-up skipped: no media collection available")
+        return False
     
+    try:
+        # Any cheap round trip establishes the gRPC channel and auth token
+        collection_ref.document('_warmup').get(field_paths=['path'])
+        print(f"Firestore client warmed up in process {os.getpid()}")
+        return True
+    except Exception as e:
+        print(f"Error warming up Firestore client: {str(e)}")
+        return False
+
+# Version of the media document layout written by the upload helpers
+#   1: payload base64-encoded into the string field 'data' (no 'format_version' key)
+#   2: payload stored as raw bytes in the Firestore bytes field 'data'
+MEDIA_FORMAT_VERSION = 2
+
+# Build the Firestore document for a file held in memory
+def build_file_document(file_bytes, destination_path, content_type, filename):
+    return {
+        'format_version': MEDIA_FORMAT_VERSION,
+        'name': filename,
+        'path': destination_path,
+        'content_type': content_type,
+        'size': len(file_bytes),
+        'sha256': hashlib.sha256(file_bytes).hexdigest(),
+        'data': file_bytes,
+        'uploaded_at': firestore.SERVER_TIMESTAMP
+    }
+
+# Upload a file to Firestore
+def upload_file_to_firestore(file_path, destination_path):
     try:
         # Read file as binary
         with open(file_path, 'rb') as file:
@@ -169,91 +238,459 @@ def upload_file_to_firestore(file_path, destination_path):
         mime_type, _ = mimetypes.guess_type(file_path)
         if not mime_type:
             mime_type = 'application/octet-stream'
+    except Exception as e:
+        print(f"Error reading file {file_path} for upload: {str(e)}")
+        return None
+    
+    return upload_from_memory_to_firestore(
+        file_data,
+        destination_path,
+        mime_type,
+        os.path.basename(file_path)
+    )
+
+# Files larger than this are split into a manifest document plus ordered
+# chunk documents, keeping each document under Firestore's 1 MiB limit
+DEFAULT_MEDIA_CHUNK_SIZE = 768 * 1024
+
+def get_media_chunk_size():
+    return getattr(settings, 'MEDIA_CHUNK_SIZE', DEFAULT_MEDIA_CHUNK_SIZE)
+
+# Create a document ID from a media path (with some cleaning)
+def get_document_id(file_path):
+    return file_path.replace('/', '_')
+
+# Chunk documents live in a 'chunks' subcollection of the manifest document.
+# Their IDs are prefixed with a content generation so that overwriting a file
+# never mixes chunks of the old and new content.
+def get_chunk_id(generation, index):
+    return f"{generation}-{index:06d}"
+
+# Write the chunk documents for a large file and return the manifest fields
+def write_file_chunks(doc_ref, file_bytes, generation, chunk_size):
+    return write_stream_chunks(doc_ref, BytesIO(file_bytes), generation, chunk_size)
+
+# Same as write_file_chunks, reading the file from a stream so that only one
+# chunk is held in memory at a time
+def write_stream_chunks(doc_ref, stream, generation, chunk_size):
+    chunks_ref = doc_ref.collection('chunks')
+    chunk_count = 0
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        chunks_ref.document(get_chunk_id(generation, chunk_count)).set({
+            'index': chunk_count,
+            'data': data
+        })
+        chunk_count += 1
+    
+    return {
+        'chunked': True,
+        'generation': generation,
+        'chunk_size': chunk_size,
+        'chunk_count': chunk_count
+    }
+
+# Delete chunk documents of a file, except those of the given generation
+def delete_file_chunks(doc_ref, keep_generation=None):
+    for chunk_ref in doc_ref.collection('chunks').list_documents():
+        if keep_generation and chunk_ref.id.startswith(f"{keep_generation}-"):
+            continue
+        chunk_ref.delete()
+
+# Content-addressed storage keeps each distinct file once, in a blob
+# document keyed by its SHA-256 digest. Path documents then only hold the
+# file metadata plus a 'blob' reference, and each blob counts its references.
+MEDIA_BLOB_COLLECTION = 'media_blobs'
+
+def is_content_addressed():
+    return getattr(settings, 'MEDIA_CONTENT_ADDRESSED', False)
+
+def get_blob_collection():
+    return get_media_collection(MEDIA_BLOB_COLLECTION)
+
+# Add a reference to the blob holding file_bytes, creating it if needed
+def acquire_blob(file_bytes, digest):
+    blob_collection = get_blob_collection()
+    if not blob_collection:
+        raise IOError("Could not get media blob collection reference")
+    
+    blob_ref = blob_collection.document(digest)
+    try:
+        # The common case for re-uploads: the blob already exists
+        blob_ref.update({'ref_count': firestore.Increment(1)})
+        return
+    except google_exceptions.NotFound:
+        pass
+    
+    blob = {
+        'format_version': MEDIA_FORMAT_VERSION,
+        'size': len(file_bytes),
+        'sha256': digest,
+        'data': file_bytes,
+        'ref_count': 1,
+        'created_at': firestore.SERVER_TIMESTAMP
+    }
+    
+    # Blob chunks use a random generation so a blob that is deleted and
+    # re-created concurrently never shares chunk documents with the old one
+    chunk_size = get_media_chunk_size()
+    generation = None
+    if len(file_bytes) > chunk_size:
+        generation = uuid.uuid4().hex[:16]
+        del blob['data']
+        blob.update(write_file_chunks(blob_ref, file_bytes, generation, chunk_size))
+    
+    try:
+        # create() fails if another upload of the same content won the race
+        blob_ref.create(blob)
+    except google_exceptions.AlreadyExists:
+        if generation:
+            delete_chunk_generation(blob_ref, generation, blob['chunk_count'])
+        blob_ref.update({'ref_count': firestore.Increment(1)})
+
+@firestore.transactional
+def _release_blob_in_transaction(transaction, blob_ref):
+    snapshot = blob_ref.get(
+        field_paths=['ref_count', 'chunked', 'generation', 'chunk_count'],
+        transaction=transaction
+    )
+    if not snapshot.exists:
+        return None
+    
+    blob = snapshot.to_dict()
+    if blob.get('ref_count', 0) <= 1:
+        transaction.delete(blob_ref)
+        return blob
+    
+    transaction.update(blob_ref, {'ref_count': firestore.Increment(-1)})
+    return None
+
+# Drop a reference to a blob, deleting it once the last reference is gone
+def release_blob(digest):
+    db = get_firestore_db()
+    blob_collection = get_blob_collection()
+    if not db or not blob_collection:
+        print(f"Could not get media blob collection reference for releasing {digest}")
+        return False
+    
+    blob_ref = blob_collection.document(digest)
+    deleted_blob = _release_blob_in_transaction(db.transaction(), blob_ref)
+    if deleted_blob and deleted_blob.get('chunked'):
+        delete_chunk_generation(blob_ref, deleted_blob['generation'], deleted_blob['chunk_count'])
+    return True
+
+# Delete the chunk documents of one known generation
+def delete_chunk_generation(doc_ref, generation, chunk_count):
+    chunks_ref = doc_ref.collection('chunks')
+    for index in range(chunk_count):
+        chunks_ref.document(get_chunk_id(generation, index)).delete()
+
+# Upload a file from memory to Firestore
+def upload_from_memory_to_firestore(file_bytes, destination_path, content_type, filename):
+    # Get media collection reference
+    collection_ref = get_media_collection()
+    if not collection_ref:
+        return None
+    
+    try:
+        # Create file metadata; the payload is stored as raw bytes
+        file_metadata = build_file_document(file_bytes, destination_path, content_type, filename)
         
-        # Encode file data as base64
-        encoded_data = base64.b64encode(file_data).decode('utf-8')
+        doc_ref = collection_ref.document(get_document_id(destination_path))
         
-        # Create file metadata
-        file_metadata = {
-            'name': os.path.basename(file_path),
-            'path': destination_path,
-            'content_type': mime_type,
-            'size': len(file_data),
-            'data': encoded_data,
-            'uploaded_at': firestore.SERVER_TIMESTAMP
-        }
+        # Remember which blob (if any) this path pointed at before
+        previous = doc_ref.get(field_paths=['blob'])
+        previous_blob = (previous.to_dict() or {}).get('blob') if previous.exists else None
         
-        # Create a document ID from the path (with some cleaning)
-        doc_id = destination_path.replace('/', '_')
+        generation = None
+        if is_content_addressed():
+            # Store the payload once under its digest and only reference it here
+            digest = file_metadata['sha256']
+            if previous_blob != digest:
+                acquire_blob(file_bytes, digest)
+            del file_metadata['data']
+            file_metadata['blob'] = digest
+        elif len(file_bytes) > get_media_chunk_size():
+            # Large files go into chunk documents, written before the manifest
+            # so readers never see a manifest pointing at missing chunks
+            generation = file_metadata['sha256'][:16]
+            del file_metadata['data']
+            file_metadata.update(
+                write_file_chunks(doc_ref, file_bytes, generation, get_media_chunk_size())
+            )
         
         # Save to Firestore
-        doc_ref = collection_ref.document(doc_id)
         doc_ref.set(file_metadata)
         
+        # Remove chunks and blob references left over from previous content
+        delete_file_chunks(doc_ref, keep_generation=generation)
+        if previous_blob and previous_blob != file_metadata.get('blob'):
+            release_blob(previous_blob)
+        
         # Return a URL-like reference to the file
         return f"/media/{destination_path}"
     except Exception as e:
         print(f"Error uploading file to Firestore: {str(e)}")
         return None
 
-# Upload a file from memory to Firestore
-def upload_from_memory_to_firestore(file_bytes, destination_path, content_type, filename):
+# Upload a file from a seekable stream without reading it into memory:
+# large files are written chunk by chunk as they are read. Small files and
+# the content-addressed store (which needs the whole payload) go through
+# upload_from_memory_to_firestore. Pass sha256 if it is already known.
+def upload_stream_to_firestore(stream, destination_path, content_type, filename, size, sha256=None):
+    chunk_size = get_media_chunk_size()
+    if size <= chunk_size or is_content_addressed():
+        return upload_from_memory_to_firestore(stream.read(), destination_path, content_type, filename)
+    
     # Get media collection reference
     collection_ref = get_media_collection()
     if not collection_ref:
         return None
     
     try:
-        # Encode file data as base64
-        encoded_data = base64.b64encode(file_bytes).decode('utf-8')
+        if not sha256:
+            # The digest names the chunk generation, so hash the stream first
+            digest = hashlib.sha256()
+            for block in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(block)
+            sha256 = digest.hexdigest()
+            stream.seek(0)
+        
+        doc_ref = collection_ref.document(get_document_id(destination_path))
         
-        # Create file metadata
+        # Remember which blob (if any) this path pointed at before
+        previous = doc_ref.get(field_paths=['blob'])
+        previous_blob = (previous.to_dict() or {}).get('blob') if previous.exists else None
+        
+        # Chunks are written before the manifest, as in upload_from_memory_to_firestore
+        generation = sha256[:16]
         file_metadata = {
+            'format_version': MEDIA_FORMAT_VERSION,
             'name': filename,
             'path': destination_path,
             'content_type': content_type,
-            'size': len(file_bytes),
-            'data': encoded_data,
+            'size': size,
+            'sha256': sha256,
             'uploaded_at': firestore.SERVER_TIMESTAMP
         }
-        
-        # Create a document ID from the path (with some cleaning)
-        doc_id = destination_path.replace('/', '_')
-        
-        # Save to Firestore
-        doc_ref = collection_ref.document(doc_id)
+        file_metadata.update(write_stream_chunks(doc_ref, stream, generation, chunk_size))
         doc_ref.set(file_metadata)
         
-        # Return a URL-like reference to the file
+        # Remove chunks and blob references left over from previous content
+        delete_file_chunks(doc_ref, keep_generation=generation)
+        if previous_blob:
+            release_blob(previous_blob)
+        
         return f"/media/{destination_path}"
     except Exception as e:
         print(f"Error uploading file to Firestore: {str(e)}")
         return None
 
-# Get file from Firestore
+# Firestore rejects write requests over 10 MiB, so batches stay below this
+MEDIA_BATCH_MAX_BYTES = 8 * 1024 * 1024
+
+# Upload several files in one batched write. Takes a list of
+# (file_bytes, destination_path, content_type, filename) tuples and returns
+# the destination paths that were written. Files that need chunking or the
+# content-addressed store are uploaded one by one instead.
+def upload_batch_to_firestore(files):
+    db = get_firestore_db()
+    collection_ref = get_media_collection()
+    if not db or not collection_ref:
+        return []
+    
+    uploaded = []
+    batched = []
+    for file_bytes, destination_path, content_type, filename in files:
+        if is_content_addressed() or len(file_bytes) > get_media_chunk_size():
+            if upload_from_memory_to_firestore(file_bytes, destination_path, content_type, filename):
+                uploaded.append(destination_path)
+        else:
+            batched.append((file_bytes, destination_path, content_type, filename))
+    
+    if not batched:
+        return uploaded
+    
+    try:
+        doc_refs = [collection_ref.document(get_document_id(item[1])) for item in batched]
+        
+        # One round trip to find paths whose previous content left chunks or blobs
+        previous = {}
+        for snapshot in db.get_all(doc_refs, field_paths=['blob', 'chunked']):
+            if snapshot.exists:
+                previous[snapshot.id] = snapshot.to_dict() or {}
+        
+        batch = db.batch()
+        for doc_ref, (file_bytes, destination_path, content_type, filename) in zip(doc_refs, batched):
+            batch.set(doc_ref, build_file_document(file_bytes, destination_path, content_type, filename))
+        batch.commit()
+        
+        for doc_ref in doc_refs:
+            old = previous.get(doc_ref.id, {})
+            if old.get('chunked'):
+                delete_file_chunks(doc_ref)
+            if old.get('blob'):
+                release_blob(old['blob'])
+        
+        uploaded.extend(item[1] for item in batched)
+    except Exception as e:
+        print(f"Error uploading batch to Firestore: {str(e)}")
+    
+    return uploaded
+
+# Return the raw bytes of a stored file, whichever format it was written in
+def decode_file_data(file_data):
+    data = file_data['data']
+    if isinstance(data, str):
+        # Format 1: base64-encoded string
+        return base64.b64decode(data)
+    return bytes(data)
+
+# Check whether a Firestore document describes a readable file
+def is_file_document(file_data):
+    return bool(file_data) and (
+        'data' in file_data or file_data.get('chunked', False) or 'blob' in file_data
+    )
+
+# Reference documents written by the content-addressed store only point at a
+# blob; fetch the blob so the returned dict carries the payload fields too
+def load_file_payload(file_data):
+    if 'blob' not in file_data or 'data' in file_data or file_data.get('chunked'):
+        return file_data
+    
+    blob_collection = get_blob_collection()
+    if not blob_collection:
+        raise IOError(f"Could not get media blob collection reference for {file_data['blob']}")
+    
+    blob = blob_collection.document(file_data['blob']).get()
+    if not blob.exists:
+        raise IOError(f"Missing blob {file_data['blob']} for {file_data.get('path')}")
+    
+    payload = dict(file_data)
+    blob_data = blob.to_dict()
+    for field in ('data', 'chunked', 'generation', 'chunk_size', 'chunk_count'):
+        if field in blob_data:
+            payload[field] = blob_data[field]
+    return payload
+
+# Get the collection holding the chunk documents of a stored file
+def get_chunks_collection(file_path, file_data):
+    if file_data.get('blob'):
+        parent = get_blob_collection()
+        doc_id = file_data['blob']
+    else:
+        parent = get_media_collection()
+        doc_id = get_document_id(file_path)
+    
+    if not parent:
+        raise IOError(f"Could not get media collection reference for {file_path}")
+    return parent.document(doc_id).collection('chunks')
+
+# Yield the bytes of a stored file between start and end (inclusive), one
+# chunk document at a time so large files never sit in memory at once
+def iter_file_chunks(file_path, file_data, start=0, end=None):
+    file_data = load_file_payload(file_data)
+    if end is None:
+        end = file_data.get('size', 0) - 1
+    
+    if not file_data.get('chunked'):
+        yield decode_file_data(file_data)[start:end + 1]
+        return
+    
+    chunks_ref = get_chunks_collection(file_path, file_data)
+    chunk_size = file_data['chunk_size']
+    for index in range(start // chunk_size, end // chunk_size + 1):
+        chunk = chunks_ref.document(get_chunk_id(file_data['generation'], index)).get()
+        if not chunk.exists:
+            raise IOError(f"Missing chunk {index} of {file_path}")
+        
+        chunk_start = index * chunk_size
+        data = bytes(chunk.get('data'))
+        yield data[max(start - chunk_start, 0):end - chunk_start + 1]
+
+# Return the full contents of a stored file, joining chunks if needed
+def read_file_bytes(file_path, file_data):
+    file_data = load_file_payload(file_data)
+    if not file_data.get('chunked'):
+        return decode_file_data(file_data)
+    return b''.join(iter_file_chunks(file_path, file_data))
+
+# Get file from Firestore. Returns None only when the document does not
+# exist; errors are raised so a failed read is never taken for a missing file
 def get_file_from_firestore(file_path):
     # Get media collection reference
     collection_ref = get_media_collection()
     if not collection_ref:
-        print(f"Could not get media collection reference for {file_path}")
-        return None
+        raise IOError(f"Could not get media collection reference for {file_path}")
     
+    # Get document from Firestore
+    doc_ref = collection_ref.document(get_document_id(file_path))
+    doc = doc_ref.get()
+    
+    if doc.exists:
+        return doc.to_dict()
+    print(f"File not found in Firestore: {file_path}")
+    return None
+
+# Every field of a media document except the payload itself
+MEDIA_METADATA_FIELDS = [
+    'format_version', 'name', 'path', 'content_type', 'size', 'sha256', 'uploaded_at',
+    'blob', 'chunked', 'generation', 'chunk_size', 'chunk_count'
+]
+
+# Get file metadata from Firestore without downloading the payload. Like
+# get_file_from_firestore, None means the document does not exist
+def get_file_metadata_from_firestore(file_path):
+    # Get media collection reference
+    collection_ref = get_media_collection()
+    if not collection_ref:
+        raise IOError(f"Could not get media collection reference for {file_path}")
+    
+    # A projected read only transfers the listed fields
+    doc_ref = collection_ref.document(get_document_id(file_path))
+    doc = doc_ref.get(field_paths=MEDIA_METADATA_FIELDS)
+    
+    if doc.exists:
+        return doc.to_dict() or {}
+    return None
+
+# Get the metadata of several files in one round trip; returns a dict of
+# path -> metadata, with None for files that do not exist
+def get_files_metadata_from_firestore(file_paths):
+    db = get_firestore_db()
+    collection_ref = get_media_collection()
+    if not db or not collection_ref:
+        print("Could not get media collection reference for batch metadata read")
+        return {}
+
     try:
-        # Create a document ID from the path (with some cleaning)
-        doc_id = file_path.replace('/', '_')
-        
-        # Get document from Firestore
-        doc_ref = collection_ref.document(doc_id)
-        doc = doc_ref.get()
-        
-        if doc.exists:
-            return doc.to_dict()
-        else:
-            print(f"File not found in Firestore: {file_path}")
-            return None
+        doc_refs = {get_document_id(path): path for path in file_paths}
+        metadata = {path: None for path in file_paths}
+        snapshots = db.get_all(
+            [collection_ref.document(doc_id) for doc_id in doc_refs],
+            field_paths=MEDIA_METADATA_FIELDS
+        )
+        for snapshot in snapshots:
+            if snapshot.exists:
+                metadata[doc_refs[snapshot.id]] = snapshot.to_dict() or {}
+        return metadata
     except Exception as e:
-        print(f"Error getting file from Firestore: {str(e)}")
-        return None
+        print(f"Error getting file metadata from Firestore: {str(e)}")
+        return {}
+
+# Get a content digest for a stored file without decoding its payload
+def get_file_digest(file_data):
+    if file_data.get('sha256'):
+        return file_data['sha256']
+    
+    # Older documents were written without a digest, so hash the stored
+    # payload as-is instead; it changes whenever the content does
+    data = file_data.get('data') or b''
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
 
 # Delete file from Firestore
 def delete_file_from_firestore(file_path):
@@ -264,12 +701,17 @@ def delete_file_from_firestore(file_path):
         return False
     
     try:
-        # Create a document ID from the path (with some cleaning)
-        doc_id = file_path.replace('/', '_')
+        doc_ref = collection_ref.document(get_document_id(file_path))
+        
+        # Content-addressed files also drop their reference to the blob
+        existing = doc_ref.get(field_paths=['blob'])
+        blob = (existing.to_dict() or {}).get('blob') if existing.exists else None
         
-        # Delete document from Firestore
-        doc_ref = collection_ref.document(doc_id)
+        # Delete document from Firestore, then any chunk documents it listed
         doc_ref.delete()
+        delete_file_chunks(doc_ref)
+        if blob:
+            release_blob(blob)
         
         print(f"Successfully deleted file from Firestore: {file_path}")
         return True
@@ -5,6 +5,7 @@ from urllib.parse import urljoin
 from django.core.files.storage import Storage
 from django.utils.deconstruct import deconstructible
 from .firebase_config import upload_from_memory, delete_file
+from .media_backends import normalize_media_path
 
 @deconstructible
 class FirebaseStorage(Storage):
@@ -20,8 +21,8 @@ class FirebaseStorage(Storage):
         Get the full path including location
         """
         if self.location:
-            return os.path.join(self.location, name)
-        return name
+            name = os.path.join(self.location, name)
+        return normalize_media_path(name)
 
     def _open(self, name, mode='rb'):
         """
@@ -1,13 +1,39 @@
 from django import forms
 from PIL import Image
 from authentication.models import Task
+from authentication.taxonomy import get_category_choices, get_subcategories
 
 class AdminTaskForm(forms.ModelForm):
+    category = forms.ChoiceField(widget=forms.Select(attrs={"class": "form-control"}))
+    subcategory = forms.ChoiceField(required=False, widget=forms.Select(attrs={"class": "form-control"}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Choices come from the in-memory taxonomy; the subcategories are
+        # those of the submitted (or current) category, so a mismatched
+        # pair is rejected by the form
+        category_choices = get_category_choices()
+        self.fields["category"].choices = category_choices
+
+        category = self.data.get(self.add_prefix("category")) if self.is_bound else None
+        if category is None:
+            category = self.initial.get("category") or self.instance.category
+        if not category and category_choices:
+            category = category_choices[0][0]
+        self.fields["subcategory"].choices = [("", "---------")] + [
+            (name, name) for name in get_subcategories(category)
+        ]
+
     def clean_logo(self):
         logo = self.cleaned_data.get('logo')
         if logo:
-            img = Image.open(logo)
-            width ,height = img.size
+            # StreamingUploadHandler already read the image header
+            image_info = getattr(logo, 'image_info', None)
+            if image_info:
+                width, height = image_info['width'], image_info['height']
+            else:
+                img = Image.open(logo)
+                width ,height = img.size
             if width != height:
                 raise forms.ValidationError("Logo must be square in shape")
         return logo
@@ -17,8 +43,6 @@ class AdminTaskForm(forms.ModelForm):
         widgets = {
             "name": forms.TextInput(attrs={"class": "form-control"}),
             "link": forms.URLInput(attrs={"class": "form-control"}),
-            "category": forms.Select(attrs={"class": "form-control"}),
-            "subcategory": forms.Select(attrs={"class": "form-control"}),
             "points": forms.NumberInput(attrs={"class": "form-control"}),
             "logo": forms.ClearableFileInput(attrs={"class": "form-control"}),
         }
@@ -0,0 +1,88 @@
+import hashlib
+from django.core.management.base import BaseCommand
+from main.firebase_firestore_config import (
+    MEDIA_FORMAT_VERSION,
+    get_media_collection,
+    decode_file_data
+)
+
+class Command(BaseCommand):
+    help = 'Rewrite base64-encoded media documents in Firebase Firestore to the binary format'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            default='media',
+            help='Firestore collection holding the media documents (default: media)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Stop after converting this many documents (default: no limit)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report which documents would be converted without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        collection_name = options['collection']
+        limit = options['limit']
+        dry_run = options['dry_run']
+
+        collection_ref = get_media_collection(collection_name)
+        if not collection_ref:
+            self.stdout.write(self.style.ERROR('Failed to get Firebase Firestore collection reference'))
+            self.stdout.write(self.style.WARNING('Check your Firebase credentials and Firestore configuration'))
+            return
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No documents will be rewritten'))
+
+        scanned = 0
+        converted = 0
+        failed = 0
+        bytes_saved = 0
+
+        for doc in collection_ref.stream():
+            scanned += 1
+            file_data = doc.to_dict() or {}
+            data = file_data.get('data')
+
+            # Only legacy documents keep their payload as a base64 string
+            if not isinstance(data, str):
+                continue
+
+            path = file_data.get('path', doc.id)
+            try:
+                file_bytes = decode_file_data(file_data)
+                update = {
+                    'format_version': MEDIA_FORMAT_VERSION,
+                    'data': file_bytes,
+                    'size': len(file_bytes),
+                    'sha256': hashlib.sha256(file_bytes).hexdigest(),
+                }
+
+                if dry_run:
+                    self.stdout.write(f'[DRY RUN] Would convert {path} ({len(data)} -> {len(file_bytes)} bytes)')
+                else:
+                    # update() keeps uploaded_at and every other field intact
+                    doc.reference.update(update)
+                    self.stdout.write(f'Converted {path} ({len(data)} -> {len(file_bytes)} bytes)')
+
+                converted += 1
+                bytes_saved += len(data) - len(file_bytes)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Error converting {path}: {str(e)}'))
+
+            if limit and converted >= limit:
+                break
+
+        # Summary
+        self.stdout.write(self.style.SUCCESS(
+            f'Conversion complete. Scanned {scanned} documents, converted {converted}, '
+            f'failed {failed}, saved {bytes_saved} bytes.'
+        ))
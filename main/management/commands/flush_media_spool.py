@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from main.media_spool import get_media_spool
+
+class Command(BaseCommand):
+    help = 'Upload every file waiting in the write-behind media spool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requeue-failed',
+            action='store_true',
+            help='Give files that exhausted their retries another round of attempts'
+        )
+
+    def handle(self, *args, **options):
+        spool = get_media_spool()
+        if not spool:
+            self.stdout.write(self.style.WARNING('MEDIA_WRITE_BEHIND is disabled, nothing to flush'))
+            return
+
+        if options['requeue_failed']:
+            requeued = spool.requeue_failed()
+            self.stdout.write(f'Requeued {requeued} failed uploads')
+
+        spool.requeue_stale()
+        flushed = spool.drain()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} files from {settings.MEDIA_SPOOL_DIR}'))
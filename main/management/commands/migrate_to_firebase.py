@@ -1,9 +1,19 @@
 import os
-import django
+import json
+import time
+import hashlib
+import threading
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from main.firebase_firestore_config import get_media_collection, upload_file_to_firestore
+from main.firebase_firestore_config import (
+    MEDIA_BATCH_MAX_BYTES,
+    get_media_collection,
+    upload_batch_to_firestore
+)
+from main.media_negative_cache import forget_missing_media
+from main.media_versions import invalidate_media_version
 
 class Command(BaseCommand):
     help = 'Migrate files from local storage to Firebase Firestore'
@@ -33,6 +43,33 @@ class Command(BaseCommand):
             action='store_true',
             help='Perform a dry run without actually uploading files'
         )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=4,
+            help='Number of batches uploaded in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Maximum number of files written per Firestore batch (default: 20)'
+        )
+        parser.add_argument(
+            '--recursive',
+            action='store_true',
+            help='Also migrate files in subdirectories of the source directory'
+        )
+        parser.add_argument(
+            '--manifest',
+            help='Checkpoint file recording migrated files '
+                 '(default: .migrate_to_firebase.json in the source directory)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Upload every file even if the manifest says it was already migrated'
+        )
 
     def handle(self, *args, **options):
         source_dir = options['source_dir']
@@ -40,28 +77,35 @@ class Command(BaseCommand):
         delete_local = options['delete_local']
         bucket_override = options.get('bucket')
         dry_run = options.get('dry_run', False)
-        
+        jobs = max(1, options['jobs'])
+        batch_size = max(1, options['batch_size'])
+
         # Set bucket name in environment if provided
         if bucket_override:
             os.environ['FIREBASE_STORAGE_BUCKET'] = bucket_override
             self.stdout.write(f"Using custom bucket name: {bucket_override}")
-        
+
         # Get the full path to the source directory
         source_path = os.path.join(settings.MEDIA_ROOT, source_dir)
-        
+
         if not os.path.exists(source_path):
             self.stdout.write(self.style.ERROR(f'Source directory {source_path} does not exist'))
             return
-            
-        # Get list of files in the source directory
-        files = [f for f in os.listdir(source_path) if os.path.isfile(os.path.join(source_path, f))]
-        
+
+        manifest_path = options.get('manifest') or os.path.join(source_path, '.migrate_to_firebase.json')
+        self.manifest = self.load_manifest(manifest_path)
+        self.manifest_path = manifest_path
+        self.manifest_lock = threading.Lock()
+
+        # Get list of files in the source directory, relative to it
+        files = self.list_files(source_path, options['recursive'], manifest_path)
+
         if not files:
             self.stdout.write(self.style.WARNING(f'No files found in {source_path}'))
             return
-            
+
         self.stdout.write(f'Found {len(files)} files to migrate')
-        
+
         # Get Firebase Firestore collection reference
         if not dry_run:
             collection_ref = get_media_collection()
@@ -72,44 +116,168 @@ class Command(BaseCommand):
                 return
         else:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No files will be uploaded'))
-            
-        # Migrate each file
-        success_count = 0
-        for filename in files:
-            file_path = os.path.join(source_path, filename)
-            firebase_path = f"{destination_dir}/{filename}"
-            
-            self.stdout.write(f'Migrating {filename} to Firebase Firestore...')
-            
-            try:
-                if not dry_run:
-                    # Get file mime type
-                    mime_type, _ = mimetypes.guess_type(file_path)
-                    if not mime_type:
-                        mime_type = 'application/octet-stream'
-                    
-                    # Upload to Firebase Firestore
-                    media_url = upload_file_to_firestore(file_path, firebase_path)
-                    
-                    if media_url:
-                        self.stdout.write(self.style.SUCCESS(f'Successfully uploaded {filename} to Firebase Firestore'))
-                        self.stdout.write(f'Media URL: {media_url}')
-                        success_count += 1
-                        
-                        # Delete local file if requested
-                        if delete_local:
-                            os.remove(file_path)
-                            self.stdout.write(f'Deleted local file {file_path}')
-                    else:
-                        self.stdout.write(self.style.ERROR(f'Failed to upload {filename} to Firebase Firestore'))
-                else:
-                    # Dry run - just log what would happen
-                    self.stdout.write(f'[DRY RUN] Would upload {filename} to Firebase Firestore at path: {firebase_path}')
-                    success_count += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error migrating {filename}: {str(e)}'))
-        
+
+        # Skip files the manifest already records as migrated with the same content
+        pending = []
+        skipped = 0
+        for relative_path in files:
+            file_path = os.path.join(source_path, relative_path)
+            size = os.path.getsize(file_path)
+            digest = self.file_digest(file_path)
+            entry = self.manifest.get(relative_path)
+            if (not options['force'] and entry and entry.get('status') == 'done'
+                    and entry.get('size') == size and entry.get('digest') == digest):
+                skipped += 1
+                continue
+            pending.append((relative_path, size, digest))
+
+        if skipped:
+            self.stdout.write(f'Skipping {skipped} files already migrated according to {manifest_path}')
+
+        if dry_run:
+            for relative_path, size, digest in pending:
+                firebase_path = f"{destination_dir}/{relative_path}"
+                self.stdout.write(f'[DRY RUN] Would upload {relative_path} to Firebase Firestore at path: {firebase_path}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Migration complete. {len(pending)} of {len(files)} files would be migrated.'
+            ))
+            return
+
+        batches = self.make_batches(pending, batch_size)
+
+        # Upload batches in parallel, checkpointing after each one
+        self.success_count = 0
+        self.failed_count = 0
+        self.uploaded_bytes = 0
+        self.started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(self.migrate_batch, batch, source_path, destination_dir, delete_local)
+                for batch in batches
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Error migrating batch: {str(e)}'))
+                self.report_progress(len(pending))
+
         # Summary
-        self.stdout.write(self.style.SUCCESS(f'Migration complete. {success_count} of {len(files)} files migrated successfully.'))
-        if delete_local and success_count == len(files):
+        elapsed = time.monotonic() - self.started_at
+        self.stdout.write(self.style.SUCCESS(
+            f'Migration complete. {self.success_count} of {len(pending)} files migrated successfully '
+            f'in {elapsed:.1f}s ({skipped} already migrated, {self.failed_count} failed).'
+        ))
+        if delete_local and self.failed_count == 0:
             self.stdout.write(self.style.SUCCESS(f'All files have been deleted from local storage.'))
+
+    def list_files(self, source_path, recursive, manifest_path):
+        """
+        Return file paths relative to source_path, excluding the manifest.
+        """
+        if recursive:
+            files = []
+            for root, _, filenames in os.walk(source_path):
+                for filename in filenames:
+                    files.append(os.path.relpath(os.path.join(root, filename), source_path))
+        else:
+            files = [f for f in os.listdir(source_path) if os.path.isfile(os.path.join(source_path, f))]
+
+        manifest_name = os.path.relpath(os.path.abspath(manifest_path), source_path)
+        return sorted(f.replace(os.sep, '/') for f in files if f != manifest_name)
+
+    def file_digest(self, file_path):
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def make_batches(self, pending, batch_size):
+        """
+        Group files into batches bounded by count and by total bytes.
+        """
+        batches = []
+        current = []
+        current_bytes = 0
+        for item in pending:
+            size = item[1]
+            if current and (len(current) >= batch_size or current_bytes + size > MEDIA_BATCH_MAX_BYTES):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(item)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def migrate_batch(self, batch, source_path, destination_dir, delete_local):
+        files = []
+        for relative_path, size, digest in batch:
+            file_path = os.path.join(source_path, relative_path)
+
+            # Get file mime type
+            mime_type, _ = mimetypes.guess_type(file_path)
+            if not mime_type:
+                mime_type = 'application/octet-stream'
+
+            with open(file_path, 'rb') as file:
+                file_bytes = file.read()
+            files.append((file_bytes, f"{destination_dir}/{relative_path}", mime_type, os.path.basename(relative_path)))
+
+        uploaded = set(upload_batch_to_firestore(files))
+
+        with self.manifest_lock:
+            for relative_path, size, digest in batch:
+                firebase_path = f"{destination_dir}/{relative_path}"
+                succeeded = firebase_path in uploaded
+                self.manifest[relative_path] = {
+                    'path': firebase_path,
+                    'size': size,
+                    'digest': digest,
+                    'status': 'done' if succeeded else 'failed',
+                }
+                if succeeded:
+                    # Links to this file may have been answered with 404s,
+                    # and workers may hold a copy of the old content
+                    forget_missing_media(firebase_path)
+                    invalidate_media_version(firebase_path)
+                    self.success_count += 1
+                    self.uploaded_bytes += size
+                    self.stdout.write(self.style.SUCCESS(f'Successfully uploaded {relative_path} to Firebase Firestore'))
+
+                    # Delete local file if requested
+                    if delete_local:
+                        os.remove(os.path.join(source_path, relative_path))
+                        self.stdout.write(f'Deleted local file {relative_path}')
+                else:
+                    self.failed_count += 1
+                    self.stdout.write(self.style.ERROR(f'Failed to upload {relative_path} to Firebase Firestore'))
+
+            # Checkpoint after every batch so an interrupted run can resume
+            self.save_manifest()
+
+    def report_progress(self, total):
+        elapsed = max(time.monotonic() - self.started_at, 0.001)
+        done = self.success_count + self.failed_count
+        self.stdout.write(
+            f'Progress: {done}/{total} files, {self.uploaded_bytes / (1024 * 1024):.1f} MB '
+            f'({done / elapsed:.1f} files/s, {self.uploaded_bytes / (1024 * 1024) / elapsed:.2f} MB/s)'
+        )
+
+    def load_manifest(self, manifest_path):
+        try:
+            with open(manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            self.stdout.write(self.style.WARNING(f'Ignoring unreadable manifest {manifest_path}'))
+            return {}
+
+    def save_manifest(self):
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,789 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from datetime import datetime, timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils._os import safe_join
+from django.utils.module_loading import import_string
+from .firebase_firestore_config import (
+    get_file_from_firestore,
+    get_file_metadata_from_firestore,
+    get_files_metadata_from_firestore,
+    get_file_digest,
+    is_file_document,
+    load_file_payload,
+    decode_file_data,
+    iter_file_chunks,
+    upload_from_memory_to_firestore,
+    upload_stream_to_firestore,
+    upload_batch_to_firestore,
+    delete_file_from_firestore,
+    warm_up_firestore
+)
+from .firebase_firestore_async import (
+    async_get_file_from_firestore,
+    async_get_file_metadata_from_firestore,
+    async_load_file_payload,
+    async_iter_file_chunks
+)
+from .media_hot_tier import MediaHotTier
+from .media_single_flight import SingleFlight, AsyncSingleFlight, FileLockFlight
+
+
+def normalize_media_path(name):
+    """
+    Turn a storage name or URL path into the canonical media path used as
+    the key by every backend: forward slashes and no leading slash.
+    """
+    return name.replace('\\', '/').lstrip('/')
+
+
+class MediaBackend:
+    """
+    Where media bytes live. Files are addressed by their media path
+    (``applogo/foo.png``) and described by a metadata dict holding at least
+    ``name``, ``path``, ``content_type``, ``size``, ``sha256`` and
+    ``uploaded_at`` (an aware datetime).
+
+    ``get`` returns the metadata plus the payload in ``data``. Backends may
+    leave ``data`` out for large files; callers then read the bytes with
+    ``iter_range``. The batch variants default to one call per file and are
+    overridden where the backend can do better.
+
+    ``astat``, ``aget`` and ``aiter_range`` are the async read path used by
+    the async media view. By default they run the sync methods in a worker
+    thread; backends with a native async client override them.
+    """
+
+    def stat(self, path):
+        """
+        Return the metadata of a file without its payload, or None.
+        """
+        raise NotImplementedError
+
+    def get(self, path):
+        """
+        Return the metadata and payload of a file, or None.
+        """
+        raise NotImplementedError
+
+    def put(self, file_bytes, path, content_type, filename):
+        """
+        Store a file, replacing any previous content. Returns True on success.
+        """
+        raise NotImplementedError
+
+    def put_stream(self, stream, path, content_type, filename, size, sha256=None):
+        """
+        Store a file read from a seekable stream, passing its digest when it
+        is already known. Backends that can write incrementally override
+        this; by default the stream is read whole.
+        """
+        return self.put(stream.read(), path, content_type, filename)
+
+    def delete(self, path):
+        """
+        Delete a file. Returns True on success, including when it was missing.
+        """
+        raise NotImplementedError
+
+    def iter_range(self, path, file_data, start, end):
+        """
+        Yield the bytes of a file between start and end (inclusive), given
+        the dict returned by ``get``.
+        """
+        yield file_data['data'][start:end + 1]
+
+    def read(self, path):
+        """
+        Return the full contents of a file, or None if it does not exist.
+        """
+        file_data = self.get(path)
+        if file_data is None:
+            return None
+        if 'data' in file_data:
+            return file_data['data']
+        return b''.join(self.iter_range(path, file_data, 0, file_data['size'] - 1))
+
+    def stat_many(self, paths):
+        return {path: self.stat(path) for path in paths}
+
+    def get_many(self, paths):
+        return {path: self.get(path) for path in paths}
+
+    def put_many(self, files):
+        """
+        Store several (file_bytes, path, content_type, filename) tuples and
+        return the paths that were written.
+        """
+        return [file[1] for file in files if self.put(*file)]
+
+    def delete_many(self, paths):
+        return [path for path in paths if self.delete(path)]
+
+    def warm_up(self):
+        """
+        Open connections before the first request needs them.
+        """
+        return True
+
+    def stat_fresh(self, path):
+        """
+        Return the metadata of a file from the backend itself, bypassing
+        (and dropping, if outdated) any local copy.
+        """
+        return self.stat(path)
+
+    def get_local(self, path):
+        """
+        Return a file from a local copy without fetching it, or None.
+        """
+        return None
+
+    def flush_local(self):
+        """
+        Make files copied locally visible to the other workers.
+        """
+
+    async def astat(self, path):
+        return await sync_to_async(self.stat, thread_sensitive=False)(path)
+
+    async def aget(self, path):
+        return await sync_to_async(self.get, thread_sensitive=False)(path)
+
+    async def aiter_range(self, path, file_data, start, end):
+        if 'data' in file_data:
+            yield file_data['data'][start:end + 1]
+            return
+
+        # Pull each chunk of the sync iterator in a worker thread
+        chunks = iter(self.iter_range(path, file_data, start, end))
+        next_chunk = sync_to_async(next, thread_sensitive=False)
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class FirestoreBackend(MediaBackend):
+    """
+    Media stored in Firebase Firestore documents, using the helpers in
+    main.firebase_firestore_config (chunked and content-addressed files,
+    legacy base64 documents).
+    """
+
+    def stat(self, path):
+        return get_file_metadata_from_firestore(path)
+
+    def _check_document(self, path, file_data):
+        if not is_file_document(file_data):
+            raise IOError(f"Invalid file data format for: {path}")
+
+        # Legacy documents have no stored digest; derive one before decoding
+        file_data['sha256'] = get_file_digest(file_data)
+        return file_data
+
+    def _decode_payload(self, file_data):
+        if not file_data.get('chunked'):
+            # Only legacy base64 documents need decoding
+            file_data['data'] = decode_file_data(file_data)
+        return file_data
+
+    def get(self, path):
+        file_data = get_file_from_firestore(path)
+        if not file_data:
+            return None
+        file_data = self._check_document(path, file_data)
+
+        # Content-addressed files keep their payload in a separate blob
+        return self._decode_payload(load_file_payload(file_data))
+
+    def put(self, file_bytes, path, content_type, filename):
+        return bool(upload_from_memory_to_firestore(file_bytes, path, content_type, filename))
+
+    def put_stream(self, stream, path, content_type, filename, size, sha256=None):
+        return bool(upload_stream_to_firestore(stream, path, content_type, filename, size, sha256))
+
+    def delete(self, path):
+        return delete_file_from_firestore(path)
+
+    def iter_range(self, path, file_data, start, end):
+        if 'data' in file_data:
+            return super().iter_range(path, file_data, start, end)
+
+        # Large files are read one chunk document at a time
+        return iter_file_chunks(path, file_data, start, end)
+
+    def stat_many(self, paths):
+        return get_files_metadata_from_firestore(paths)
+
+    def put_many(self, files):
+        return upload_batch_to_firestore(files)
+
+    def warm_up(self):
+        return warm_up_firestore()
+
+    async def astat(self, path):
+        return await async_get_file_metadata_from_firestore(path)
+
+    async def aget(self, path):
+        file_data = await async_get_file_from_firestore(path)
+        if not file_data:
+            return None
+        file_data = self._check_document(path, file_data)
+        return self._decode_payload(await async_load_file_payload(file_data))
+
+    def aiter_range(self, path, file_data, start, end):
+        if 'data' in file_data:
+            return super().aiter_range(path, file_data, start, end)
+        return async_iter_file_chunks(path, file_data, start, end)
+
+
+class SimulatedBackend(MediaBackend):
+    """
+    Base for the local backends, which can add an artificial delay to each
+    round trip so benchmarks see roughly the latency of a remote store.
+    A batch operation counts as a single round trip.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = getattr(settings, 'MEDIA_BACKEND_LATENCY', 0) if latency is None else latency
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _metadata(self, file_bytes, path, content_type, filename):
+        return {
+            'name': filename,
+            'path': path,
+            'content_type': content_type,
+            'size': len(file_bytes),
+            'sha256': hashlib.sha256(file_bytes).hexdigest(),
+            'uploaded_at': datetime.now(timezone.utc),
+        }
+
+    def stat(self, path):
+        self._round_trip()
+        return self._stat(path)
+
+    def get(self, path):
+        self._round_trip()
+        return self._get(path)
+
+    def put(self, file_bytes, path, content_type, filename):
+        self._round_trip()
+        return self._put(file_bytes, path, content_type, filename)
+
+    def put_stream(self, stream, path, content_type, filename, size, sha256=None):
+        self._round_trip()
+        return self._put_stream(stream, path, content_type, filename)
+
+    def _put_stream(self, stream, path, content_type, filename):
+        return self._put(stream.read(), path, content_type, filename)
+
+    def delete(self, path):
+        self._round_trip()
+        return self._delete(path)
+
+    def stat_many(self, paths):
+        self._round_trip()
+        return {path: self._stat(path) for path in paths}
+
+    def get_many(self, paths):
+        self._round_trip()
+        return {path: self._get(path) for path in paths}
+
+    def put_many(self, files):
+        self._round_trip()
+        return [file[1] for file in files if self._put(*file)]
+
+    def delete_many(self, paths):
+        self._round_trip()
+        return [path for path in paths if self._delete(path)]
+
+    async def astat(self, path):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._stat(path)
+
+    async def aget(self, path):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._get(path)
+
+
+class MemoryBackend(SimulatedBackend):
+    """
+    Media kept in a dict in this process. Each worker has its own copy, so
+    it is only meant for tests, benchmarks and single-process runs.
+    """
+
+    def __init__(self, latency=None):
+        super().__init__(latency)
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, path):
+        with self._lock:
+            entry = self._files.get(path)
+        return dict(entry[0]) if entry else None
+
+    def _get(self, path):
+        with self._lock:
+            entry = self._files.get(path)
+        if not entry:
+            return None
+        return dict(entry[0], data=entry[1])
+
+    def _put(self, file_bytes, path, content_type, filename):
+        metadata = self._metadata(file_bytes, path, content_type, filename)
+        with self._lock:
+            self._files[path] = (metadata, bytes(file_bytes))
+        return True
+
+    def _delete(self, path):
+        with self._lock:
+            self._files.pop(path, None)
+        return True
+
+
+class LocalDiskBackend(SimulatedBackend):
+    """
+    Media stored as plain files under MEDIA_BACKEND_LOCATION, with the
+    metadata of each file in a JSON file under ``.meta/``. The data file
+    is written before its metadata, so a file only exists once complete.
+    """
+
+    def __init__(self, location=None, latency=None):
+        super().__init__(latency)
+        self.location = location or settings.MEDIA_BACKEND_LOCATION
+
+    def _data_path(self, path):
+        return safe_join(self.location, path)
+
+    def _meta_path(self, path):
+        return safe_join(self.location, '.meta', f"{path}.json")
+
+    def _write_atomic(self, target, data):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, target)
+
+    def _stat(self, path):
+        try:
+            with open(self._meta_path(path)) as meta_file:
+                metadata = json.load(meta_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        metadata['uploaded_at'] = datetime.fromisoformat(metadata['uploaded_at'])
+        return metadata
+
+    def _get(self, path):
+        metadata = self._stat(path)
+        if metadata is None:
+            return None
+        try:
+            with open(self._data_path(path), 'rb') as data_file:
+                metadata['data'] = data_file.read()
+        except FileNotFoundError:
+            return None
+        return metadata
+
+    def _put(self, file_bytes, path, content_type, filename):
+        metadata = self._metadata(file_bytes, path, content_type, filename)
+        metadata['uploaded_at'] = metadata['uploaded_at'].isoformat()
+        self._write_atomic(self._data_path(path), file_bytes)
+        self._write_atomic(self._meta_path(path), json.dumps(metadata).encode('utf-8'))
+        return True
+
+    def _put_stream(self, stream, path, content_type, filename):
+        # Copy block by block, hashing as we go
+        data_path = self._data_path(path)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, 'wb') as tmp_file:
+            for block in iter(lambda: stream.read(1024 * 1024), b''):
+                digest.update(block)
+                size += len(block)
+                tmp_file.write(block)
+        os.replace(tmp_path, data_path)
+
+        metadata = {
+            'name': filename,
+            'path': path,
+            'content_type': content_type,
+            'size': size,
+            'sha256': digest.hexdigest(),
+            'uploaded_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self._write_atomic(self._meta_path(path), json.dumps(metadata).encode('utf-8'))
+        return True
+
+    def _delete(self, path):
+        # Remove the metadata first so the file disappears atomically
+        for file_path in (self._meta_path(path), self._data_path(path)):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        return True
+
+
+class TieredBackend(MediaBackend):
+    """
+    A local-disk hot tier (MediaHotTier) in front of another backend.
+    Writes go to the backend first and then to the hot tier; reads are
+    answered from the hot tier when possible, and files fetched from the
+    backend are promoted into it. Files the backend only streams (chunked
+    Firestore documents) are not promoted.
+
+    Files can still be deleted or overwritten from another machine (or by
+    migrate_to_firebase), so a hot copy the backend has not confirmed for
+    ``revalidate_after`` seconds is checked with a metadata-only ``stat``
+    before it is used, and dropped if the backend no longer has it. While
+    the backend is unreachable the hot copy keeps being served.
+    """
+
+    def __init__(self, hot_tier, backend, revalidate_after=60):
+        self.hot_tier = hot_tier
+        self.backend = backend
+        self.revalidate_after = revalidate_after
+
+    def _is_stale(self, metadata):
+        return time.time() - metadata['verified_at'] >= self.revalidate_after
+
+    def _same_content(self, metadata, current):
+        if current.get('sha256'):
+            return current['sha256'] == metadata['sha256']
+        # Legacy documents have no stored digest
+        return current.get('size') == metadata['size'] and current.get('uploaded_at') == metadata['uploaded_at']
+
+    def _revalidated(self, path, metadata, current):
+        """
+        Return the hot copy if ``current`` (the backend's metadata) still
+        describes it, otherwise drop it and return None.
+        """
+        if current is not None and self._same_content(metadata, current):
+            self.hot_tier.mark_verified(path, metadata['sha256'])
+            return metadata
+        self.hot_tier.delete(path)
+        return None
+
+    def _check(self, path, metadata):
+        if metadata is None or not self._is_stale(metadata):
+            return metadata
+        try:
+            current = self.backend.stat(path)
+        except Exception as e:
+            print(f"Error revalidating the hot copy of {path}: {str(e)}")
+            return metadata
+        return self._revalidated(path, metadata, current)
+
+    async def _acheck(self, path, metadata):
+        if metadata is None or not self._is_stale(metadata):
+            return metadata
+        try:
+            current = await self.backend.astat(path)
+        except Exception as e:
+            print(f"Error revalidating the hot copy of {path}: {str(e)}")
+            return metadata
+        return await sync_to_async(self._revalidated, thread_sensitive=False)(path, metadata, current)
+
+    def _check_many(self, hot):
+        """
+        Revalidate the stale entries of a path -> hot metadata dict with one
+        batch stat; dropped entries become None.
+        """
+        stale = [path for path, metadata in hot.items() if metadata is not None and self._is_stale(metadata)]
+        if not stale:
+            return hot
+        try:
+            current = self.backend.stat_many(stale)
+        except Exception as e:
+            print(f"Error revalidating hot copies: {str(e)}")
+            return hot
+        for path in stale:
+            if path in current:
+                hot[path] = self._revalidated(path, hot[path], current[path])
+        return hot
+
+    def _promote(self, file_data):
+        try:
+            self.hot_tier.put(file_data, file_data['data'])
+        except OSError as e:
+            print(f"Error promoting {file_data.get('path')} to the hot tier: {str(e)}")
+
+    def stat(self, path):
+        return self._check(path, self.hot_tier.stat(path)) or self.backend.stat(path)
+
+    def stat_fresh(self, path):
+        current = self.backend.stat_fresh(path)
+        metadata = self.hot_tier.stat(path)
+        if metadata is not None:
+            self._revalidated(path, metadata, current)
+        return current
+
+    def get(self, path):
+        file_data = self._check(path, self.hot_tier.get(path))
+        if file_data is not None:
+            return file_data
+
+        file_data = self.backend.get(path)
+        if file_data is not None and 'data' in file_data:
+            self._promote(dict(file_data, path=path))
+        return file_data
+
+    def put(self, file_bytes, path, content_type, filename):
+        # Never leave a hot copy of content the backend did not accept
+        self.hot_tier.delete(path)
+        if not self.backend.put(file_bytes, path, content_type, filename):
+            return False
+        self._promote({
+            'name': filename,
+            'path': path,
+            'content_type': content_type,
+            'sha256': hashlib.sha256(file_bytes).hexdigest(),
+            'data': file_bytes,
+        })
+        return True
+
+    def put_stream(self, stream, path, content_type, filename, size, sha256=None):
+        self.hot_tier.delete(path)
+        if not self.backend.put_stream(stream, path, content_type, filename, size, sha256):
+            return False
+        if size <= self.hot_tier.max_entry_bytes:
+            stream.seek(0)
+            file_bytes = stream.read()
+            self._promote({
+                'name': filename,
+                'path': path,
+                'content_type': content_type,
+                'sha256': sha256 or hashlib.sha256(file_bytes).hexdigest(),
+                'data': file_bytes,
+            })
+        return True
+
+    def delete(self, path):
+        self.hot_tier.delete(path)
+        return self.backend.delete(path)
+
+    def iter_range(self, path, file_data, start, end):
+        return self.backend.iter_range(path, file_data, start, end)
+
+    def stat_many(self, paths):
+        metadata = self._check_many({path: self.hot_tier.stat(path) for path in paths})
+        misses = [path for path, value in metadata.items() if value is None]
+        if misses:
+            metadata.update(self.backend.stat_many(misses))
+        return metadata
+
+    def get_many(self, paths):
+        files = self._check_many({path: self.hot_tier.get(path) for path in paths})
+        misses = [path for path, value in files.items() if value is None]
+        if misses:
+            for path, file_data in self.backend.get_many(misses).items():
+                files[path] = file_data
+                if file_data is not None and 'data' in file_data:
+                    self._promote(dict(file_data, path=path))
+        return files
+
+    def put_many(self, files):
+        for file in files:
+            self.hot_tier.delete(file[1])
+        written = self.backend.put_many(files)
+        written_paths = set(written)
+        for file_bytes, path, content_type, filename in files:
+            if path in written_paths:
+                self._promote({
+                    'name': filename,
+                    'path': path,
+                    'content_type': content_type,
+                    'sha256': hashlib.sha256(file_bytes).hexdigest(),
+                    'data': file_bytes,
+                })
+        return written
+
+    def delete_many(self, paths):
+        for path in paths:
+            self.hot_tier.delete(path)
+        return self.backend.delete_many(paths)
+
+    def warm_up(self):
+        return self.backend.warm_up()
+
+    def get_local(self, path):
+        return self._check(path, self.hot_tier.get(path))
+
+    def flush_local(self):
+        self.hot_tier.flush()
+
+    # The hot tier reads the disk and takes locks, so it is used from a
+    # worker thread, never on the event loop
+
+    async def astat(self, path):
+        metadata = await sync_to_async(self.hot_tier.stat, thread_sensitive=False)(path)
+        return await self._acheck(path, metadata) or await self.backend.astat(path)
+
+    async def aget(self, path):
+        file_data = await sync_to_async(self.hot_tier.get, thread_sensitive=False)(path)
+        file_data = await self._acheck(path, file_data)
+        if file_data is not None:
+            return file_data
+
+        file_data = await self.backend.aget(path)
+        if file_data is not None and 'data' in file_data:
+            # Promotion takes the index file lock, so keep it off the loop
+            await sync_to_async(self._promote, thread_sensitive=False)(dict(file_data, path=path))
+        return file_data
+
+    def aiter_range(self, path, file_data, start, end):
+        return self.backend.aiter_range(path, file_data, start, end)
+
+
+class CoalescingBackend(MediaBackend):
+    """
+    Coalesces concurrent reads of the same path, so a burst of requests for
+    a file that is not cached locally (a new task's logo when it goes live)
+    costs one backend fetch instead of one per request. The first caller
+    fetches and concurrent callers in the same process share its result.
+
+    With ``file_locks`` (a FileLockFlight), a ``get`` that misses the hot
+    tier also holds a lock file while fetching and publishes the promoted
+    copy before releasing it, so workers on the same machine queue behind
+    the first one and then read that copy. Writes and range reads go
+    straight to the backend.
+    """
+
+    def __init__(self, backend, file_locks=None, timeout=10):
+        self.backend = backend
+        self.file_locks = file_locks
+        self.timeout = timeout
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+
+    def _locked_get(self, path):
+        # Most reads hit the hot tier and need no lock
+        file_data = self.backend.get_local(path)
+        if file_data is not None:
+            return file_data
+
+        handle = self.file_locks.acquire(path)
+        try:
+            file_data = self.backend.get(path)
+            self.backend.flush_local()
+            return file_data
+        finally:
+            self.file_locks.release(handle)
+
+    async def _async_locked_get(self, path):
+        file_data = await sync_to_async(self.backend.get_local, thread_sensitive=False)(path)
+        if file_data is not None:
+            return file_data
+
+        handle = await sync_to_async(self.file_locks.acquire, thread_sensitive=False)(path)
+        try:
+            file_data = await self.backend.aget(path)
+            await sync_to_async(self.backend.flush_local, thread_sensitive=False)()
+            return file_data
+        finally:
+            self.file_locks.release(handle)
+
+    def stat(self, path):
+        return self.flight.do(('stat', path), lambda: self.backend.stat(path), self.timeout)
+
+    def stat_fresh(self, path):
+        return self.flight.do(('stat_fresh', path), lambda: self.backend.stat_fresh(path), self.timeout)
+
+    def get(self, path):
+        if self.file_locks:
+            fetch = lambda: self._locked_get(path)
+        else:
+            fetch = lambda: self.backend.get(path)
+        return self.flight.do(('get', path), fetch, self.timeout)
+
+    def put(self, file_bytes, path, content_type, filename):
+        return self.backend.put(file_bytes, path, content_type, filename)
+
+    def put_stream(self, stream, path, content_type, filename, size, sha256=None):
+        return self.backend.put_stream(stream, path, content_type, filename, size, sha256)
+
+    def delete(self, path):
+        return self.backend.delete(path)
+
+    def iter_range(self, path, file_data, start, end):
+        return self.backend.iter_range(path, file_data, start, end)
+
+    def stat_many(self, paths):
+        return self.backend.stat_many(paths)
+
+    def get_many(self, paths):
+        return self.backend.get_many(paths)
+
+    def put_many(self, files):
+        return self.backend.put_many(files)
+
+    def delete_many(self, paths):
+        return self.backend.delete_many(paths)
+
+    def warm_up(self):
+        return self.backend.warm_up()
+
+    async def astat(self, path):
+        return await self.async_flight.do(('stat', path), lambda: self.backend.astat(path))
+
+    async def aget(self, path):
+        if self.file_locks:
+            fetch = lambda: self._async_locked_get(path)
+        else:
+            fetch = lambda: self.backend.aget(path)
+        return await self.async_flight.do(('get', path), fetch)
+
+    def aiter_range(self, path, file_data, start, end):
+        return self.backend.aiter_range(path, file_data, start, end)
+
+
+_media_backend = None
+_media_backend_lock = threading.Lock()
+
+
+def get_media_backend():
+    """
+    Return the process-wide backend named by the MEDIA_BACKEND setting,
+    behind the local hot tier when MEDIA_HOT_TIER_DIR is set and with
+    concurrent reads coalesced unless MEDIA_SINGLE_FLIGHT is off.
+    """
+    global _media_backend
+    if _media_backend is None:
+        with _media_backend_lock:
+            if _media_backend is None:
+                backend_class = import_string(
+                    getattr(settings, 'MEDIA_BACKEND', 'main.media_backends.FirestoreBackend')
+                )
+                backend = backend_class()
+
+                hot_tier_dir = getattr(settings, 'MEDIA_HOT_TIER_DIR', '')
+                if hot_tier_dir:
+                    hot_tier = MediaHotTier(hot_tier_dir, settings.MEDIA_HOT_TIER_MAX_BYTES)
+                    backend = TieredBackend(
+                        hot_tier, backend, getattr(settings, 'MEDIA_HOT_TIER_REVALIDATE_AFTER', 60)
+                    )
+
+                if getattr(settings, 'MEDIA_SINGLE_FLIGHT', True):
+                    timeout = getattr(settings, 'MEDIA_SINGLE_FLIGHT_TIMEOUT', 10)
+                    file_locks = None
+                    # Other workers can only reuse a fetch through the hot tier
+                    if hot_tier_dir and getattr(settings, 'MEDIA_SINGLE_FLIGHT_CROSS_WORKER', False):
+                        file_locks = FileLockFlight(os.path.join(hot_tier_dir, 'locks'), timeout)
+                    backend = CoalescingBackend(backend, file_locks, timeout)
+                _media_backend = backend
+    return _media_backend
@@ -0,0 +1,108 @@
+import time
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+class MediaCache:
+    """
+    Size-bounded, in-process LRU cache of decoded media files keyed by path.
+    Every entry expires ``ttl`` seconds after it was stored, and the least
+    recently used entries are evicted once the cached bytes exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes, ttl, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes or max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, path):
+        """
+        Return the cached entry for ``path`` or None if missing or expired.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+
+            if entry['expires_at'] <= time.monotonic():
+                self._remove(path)
+                return None
+
+            # Mark as most recently used
+            self._entries.move_to_end(path)
+            return entry
+
+    def set(self, path, data, content_type, **extra):
+        """
+        Store decoded file bytes for ``path``. Files larger than the per-entry
+        limit are not cached so one big screenshot cannot flush every logo.
+        """
+        size = len(data)
+        if not self.enabled or size > self.max_entry_bytes:
+            return
+
+        entry = dict(extra)
+        entry.update({
+            'data': data,
+            'content_type': content_type,
+            'size': size,
+            'expires_at': time.monotonic() + self.ttl,
+        })
+
+        with self._lock:
+            self._remove(path)
+            self._entries[path] = entry
+            self.current_bytes += size
+
+            # Evict least recently used entries until we are within budget
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest_path = next(iter(self._entries))
+                self._remove(oldest_path)
+
+    def invalidate(self, path):
+        """
+        Drop ``path`` from the cache, e.g. after it was overwritten or deleted.
+        """
+        with self._lock:
+            self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.current_bytes -= entry['size']
+
+
+_media_cache = None
+_media_cache_lock = threading.Lock()
+
+
+def get_media_cache():
+    """
+    Return the process-wide media cache, configured from settings on first use.
+    """
+    global _media_cache
+    if _media_cache is None:
+        with _media_cache_lock:
+            if _media_cache is None:
+                _media_cache = MediaCache(
+                    max_bytes=getattr(settings, 'MEDIA_CACHE_MAX_BYTES', 32 * 1024 * 1024),
+                    ttl=getattr(settings, 'MEDIA_CACHE_TTL', 300),
+                    max_entry_bytes=getattr(settings, 'MEDIA_CACHE_MAX_ENTRY_BYTES', 1024 * 1024),
+                )
+    return _media_cache
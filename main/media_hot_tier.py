@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the per-process lock only
+    fcntl = None
+
+# Metadata kept in the index for each path
+HOT_TIER_FIELDS = ('name', 'path', 'content_type', 'size', 'sha256', 'uploaded_at')
+
+
+class MediaHotTier:
+    """
+    Size-bounded local-disk copy of media files, shared by every worker on
+    the same machine (for example under /tmp on serverless).
+
+    Payloads are stored once per content under ``data/<sha256>``, so
+    overwriting a path never changes a file another process may be reading.
+    ``index.json`` maps each path to its metadata, last access time and the
+    time the backend last confirmed it (``verified_at``), and is persisted,
+    so the tier survives restarts.
+
+    New entries are written to the index in batches: at most every
+    ``flush_interval`` seconds or ``flush_batch`` entries, and at exit.
+    Until then only this process knows them. Deletes are written at once.
+    A flush takes a file lock, reloads the index, applies this process's
+    changes, evicts the least recently used files beyond ``max_bytes`` and
+    writes the index back atomically.
+    """
+
+    def __init__(self, directory, max_bytes, max_entry_bytes=None, flush_interval=1, flush_batch=64):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.index_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_mtime = None
+        # Entries added or verified by this process since the last flush
+        self._pending = {}
+        # Digests this process replaced; dropped at flush if unreferenced
+        self._replaced = set()
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+        with self._locked():
+            self._remove_orphans()
+        atexit.register(self._flush_at_exit)
+
+    def _data_path(self, sha256):
+        return os.path.join(self.directory, 'data', sha256)
+
+    def _reload(self):
+        """
+        Re-read the index if another process has written it since, keeping
+        the changes this process has not flushed yet.
+        """
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+
+        try:
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            return
+
+        # Keep the more recent access times seen by this process
+        for path, entry in index.items():
+            current = self._index.get(path)
+            if current and current['sha256'] == entry['sha256']:
+                entry['last_access'] = max(entry['last_access'], current['last_access'])
+        index.update(self._pending)
+        self._index = index
+        self._index_mtime = mtime
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as index_file:
+            json.dump(self._index, index_file)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def _locked(self):
+        return _IndexLock(self)
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self._index.values())
+        for path, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            del self._index[path]
+            total -= entry['size']
+            self._remove_unreferenced(entry['sha256'])
+
+    def _remove_unreferenced(self, sha256):
+        if any(entry['sha256'] == sha256 for entry in self._index.values()):
+            return
+        try:
+            os.remove(self._data_path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def _remove_orphans(self, min_age=3600):
+        """
+        Remove payloads no index entry references, e.g. written by a process
+        that died before flushing. Recent ones may belong to another
+        process's unflushed entries.
+        """
+        referenced = {entry['sha256'] for entry in self._index.values()}
+        data_dir = os.path.join(self.directory, 'data')
+        now = time.time()
+        for name in os.listdir(data_dir):
+            if name in referenced:
+                continue
+            data_path = os.path.join(data_dir, name)
+            try:
+                if now - os.path.getmtime(data_path) > min_age:
+                    os.remove(data_path)
+            except FileNotFoundError:
+                pass
+
+    def _flush_if_due(self):
+        if not self._pending:
+            return
+        if len(self._pending) >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the entries this process added since the last flush to the index.
+        """
+        if not self._pending and not self._replaced:
+            return
+        with self._locked():
+            for sha256 in self._replaced:
+                self._remove_unreferenced(sha256)
+            self._replaced = set()
+            self._evict()
+            self._save()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Error flushing the hot tier index: {str(e)}")
+
+    def stat(self, path):
+        """
+        Return the metadata of a file held in the tier, or None. It includes
+        ``verified_at``, when the backend last confirmed this content.
+        """
+        with self._lock:
+            self._reload()
+            entry = self._index.get(path)
+        if entry is None:
+            return None
+        metadata = {field: entry[field] for field in HOT_TIER_FIELDS}
+        metadata['uploaded_at'] = datetime.fromisoformat(metadata['uploaded_at'])
+        metadata['verified_at'] = entry.get('verified_at', 0)
+        return metadata
+
+    def get(self, path):
+        """
+        Return the metadata and payload of a file held in the tier, or None.
+        """
+        metadata = self.stat(path)
+        if metadata is None:
+            return None
+        try:
+            with open(self._data_path(metadata['sha256']), 'rb') as data_file:
+                metadata['data'] = data_file.read()
+        except FileNotFoundError:
+            # Evicted by another process since we read the index
+            return None
+
+        # Recency is tracked in memory and persisted with the next flush
+        with self._lock:
+            entry = self._index.get(path)
+            if entry is not None:
+                entry['last_access'] = time.time()
+        self._flush_if_due()
+        return metadata
+
+    def mark_verified(self, path, sha256):
+        """
+        Record that the backend still holds ``sha256`` at ``path``.
+        """
+        with self._lock:
+            entry = self._index.get(path)
+            if entry is not None and entry['sha256'] == sha256:
+                entry['verified_at'] = time.time()
+                self._pending[path] = entry
+        self._flush_if_due()
+
+    def put(self, metadata, file_bytes):
+        """
+        Store a file in the tier. Files above max_entry_bytes are skipped.
+        """
+        if len(file_bytes) > self.max_entry_bytes:
+            self.delete(metadata['path'])
+            return False
+
+        entry = {field: metadata.get(field) for field in HOT_TIER_FIELDS}
+        uploaded_at = entry['uploaded_at']
+        entry['uploaded_at'] = (uploaded_at or datetime.now().astimezone()).isoformat()
+        entry['size'] = len(file_bytes)
+        entry['last_access'] = entry['verified_at'] = time.time()
+
+        # Content-addressed, so no lock is needed: every writer of this
+        # name writes the same bytes
+        data_path = self._data_path(entry['sha256'])
+        if not os.path.exists(data_path):
+            tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as data_file:
+                data_file.write(file_bytes)
+            os.replace(tmp_path, data_path)
+        else:
+            # Refresh the mtime so an orphan sweep leaves it alone
+            os.utime(data_path)
+
+        with self._lock:
+            previous = self._index.get(entry['path'])
+            self._index[entry['path']] = entry
+            self._pending[entry['path']] = entry
+            if previous and previous['sha256'] != entry['sha256']:
+                self._replaced.add(previous['sha256'])
+        self._flush_if_due()
+        return True
+
+    def delete(self, path):
+        with self._locked():
+            self._pending.pop(path, None)
+            entry = self._index.pop(path, None)
+            if entry is None:
+                return
+            self._remove_unreferenced(entry['sha256'])
+            self._save()
+
+    def clear(self):
+        with self._locked():
+            for entry in self._index.values():
+                try:
+                    os.remove(self._data_path(entry['sha256']))
+                except FileNotFoundError:
+                    pass
+            self._pending = {}
+            self._replaced = set()
+            self._index = {}
+            self._save()
+
+
+class _IndexLock:
+    """
+    Hold the thread lock and an exclusive lock on the index across
+    processes, with the in-memory index refreshed from disk.
+    """
+
+    def __init__(self, tier):
+        self.tier = tier
+        self.lock_file = None
+
+    def __enter__(self):
+        self.tier._lock.acquire()
+        if fcntl:
+            self.lock_file = open(os.path.join(self.tier.directory, 'index.lock'), 'a')
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        self.tier._reload()
+
+    def __exit__(self, *exc_info):
+        if self.lock_file:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+        self.tier._lock.release()
+
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# Paths recently found missing are remembered in the MEDIA_METADATA_CACHE
+# alias of CACHES, so broken logo links and bots probing /media/ get their
+# 404 without a backend read each time. Only serve_media_file consults it:
+# storage.exists() still asks the backend, so a stale entry can never make
+# Django overwrite an existing file.
+#
+# Saving a file clears its entry, which only reaches the other workers when
+# that cache is shared (Redis, Memcached, database). When it is per process
+# (LocMemCache) entries only live for LOCAL_CACHE_MAX_TTL seconds, so other
+# workers answer 404 for a newly saved file for at most that long.
+
+LOCAL_CACHE_MAX_TTL = 10
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _missing_cache_key(path):
+    # Media paths can be longer than memcached allows and contain spaces
+    return 'media-missing:' + hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+
+def get_media_metadata_cache():
+    return caches[getattr(settings, 'MEDIA_METADATA_CACHE', 'default')]
+
+
+def _negative_cache_ttl():
+    ttl = getattr(settings, 'MEDIA_NEGATIVE_CACHE_TTL', 60)
+    if isinstance(get_media_metadata_cache(), LocMemCache):
+        return min(ttl, LOCAL_CACHE_MAX_TTL)
+    return ttl
+
+
+def is_media_missing(path):
+    """
+    Return True when ``path`` was found missing less than
+    MEDIA_NEGATIVE_CACHE_TTL seconds ago.
+    """
+    if _negative_cache_ttl() <= 0:
+        return False
+
+    missing = get_media_metadata_cache().get(_missing_cache_key(path)) is not None
+    with _stats_lock:
+        _stats['hits' if missing else 'misses'] += 1
+    return missing
+
+
+def remember_missing_media(path):
+    ttl = _negative_cache_ttl()
+    if ttl > 0:
+        get_media_metadata_cache().set(_missing_cache_key(path), True, ttl)
+
+
+def forget_missing_media(path):
+    """
+    Drop the missing marker for ``path``, e.g. once a file was saved there.
+    """
+    get_media_metadata_cache().delete(_missing_cache_key(path))
+
+
+def negative_cache_stats():
+    """
+    Return the hit and miss counts of this process since it started.
+    """
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,132 @@
+import os
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core.files.base import ContentFile
+from .media_versions import media_version
+
+# Pillow format name -> file extension for generated images
+IMAGE_EXTENSIONS = {
+    'WEBP': 'webp',
+    'PNG': 'png',
+    'JPEG': 'jpg',
+}
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _encode_image(img, image_format, quality):
+    """
+    Encode a PIL image to bytes, dropping EXIF and other metadata.
+    """
+    if image_format == 'JPEG' and img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    buffer = BytesIO()
+    if image_format == 'PNG':
+        img.save(buffer, format='PNG', optimize=True)
+    else:
+        img.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def get_logo_variant_formats():
+    """
+    Formats generated for each logo size: WebP first, then the fallback format
+    for browsers without WebP support.
+    """
+    formats = []
+    if features.check('webp'):
+        formats.append('WEBP')
+    formats.append(getattr(settings, 'LOGO_FALLBACK_FORMAT', 'PNG'))
+    return formats
+
+
+def generate_logo_variants(logo_file, logo_name, storage):
+    """
+    Resize an uploaded logo into the sizes in LOGO_VARIANT_SIZES, once per
+    format from get_logo_variant_formats(), and save them to ``storage``
+    under ``<logo dir>/variants/``.
+
+    Returns (variants, versions): a mapping of lowercase format ->
+    {size: stored name}, suitable for Task.logo_variants, and the content
+    version of each stored name for Task.media_versions. Sizes larger than
+    the original are skipped so we never upscale.
+    """
+    sizes = getattr(settings, 'LOGO_VARIANT_SIZES', [80, 160, 320])
+    quality = getattr(settings, 'LOGO_VARIANT_QUALITY', 85)
+
+    logo_file.seek(0)
+    with Image.open(logo_file) as original:
+        original.load()
+        img = original.convert('RGBA' if _has_alpha(original) else 'RGB')
+
+    directory, filename = os.path.split(logo_name)
+    stem = os.path.splitext(filename)[0]
+
+    variants = {}
+    versions = {}
+    for size in sorted(set(sizes)):
+        if size > max(img.size):
+            continue
+
+        # Logos are validated as square, so one dimension is enough
+        resized = img.resize((size, size), Image.LANCZOS)
+        for image_format in get_logo_variant_formats():
+            extension = IMAGE_EXTENSIONS[image_format]
+            data = _encode_image(resized, image_format, quality)
+            variant_name = os.path.join(directory, 'variants', f"{stem}-{size}.{extension}")
+            stored_name = storage.save(variant_name, ContentFile(data))
+            variants.setdefault(extension, {})[str(size)] = stored_name
+            versions[stored_name] = media_version(hashlib.sha256(data).hexdigest())
+
+    return variants, versions
+
+
+def normalize_screenshot(image_file):
+    """
+    Prepare an uploaded proof screenshot for storage: apply the EXIF
+    orientation, cap the longest side at SCREENSHOT_MAX_DIMENSION, strip
+    metadata and re-encode as SCREENSHOT_FORMAT at SCREENSHOT_QUALITY, or
+    in the upload's own format when that is smaller.
+
+    The result is always re-encoded, even when it is no smaller than the
+    upload, so no EXIF or text chunks (location, device) are ever stored.
+
+    Returns (file, stats) where file is the ContentFile to store and stats
+    records the original and stored sizes in bytes and the stored
+    dimensions.
+    """
+    max_dimension = getattr(settings, 'SCREENSHOT_MAX_DIMENSION', 1600)
+    image_format = getattr(settings, 'SCREENSHOT_FORMAT', 'JPEG')
+    quality = getattr(settings, 'SCREENSHOT_QUALITY', 75)
+
+    original_size = image_file.size
+    image_file.seek(0)
+    with Image.open(image_file) as original:
+        original_format = original.format
+        img = ImageOps.exif_transpose(original)
+        # thumbnail() only ever shrinks and keeps the aspect ratio
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if _has_alpha(img) else 'RGB')
+        data = _encode_image(img, image_format, quality)
+
+        if original_format in IMAGE_EXTENSIONS and original_format != image_format:
+            # Flat-colour screenshots can be smaller in their own format
+            same_format = _encode_image(img, original_format, quality)
+            if len(same_format) < len(data):
+                data, image_format = same_format, original_format
+
+    stem = os.path.splitext(os.path.basename(image_file.name))[0]
+    processed = ContentFile(data, name=f"{stem}.{IMAGE_EXTENSIONS[image_format]}")
+    stats = {
+        'original_size': original_size,
+        'processed_size': len(data),
+        'width': img.width,
+        'height': img.height,
+    }
+    return processed, stats
@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+
+class _Call:
+    """
+    A fetch in progress, shared by the thread running it and its waiters.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time within the process. Threads
+    asking for a key that is already being fetched wait for that fetch and
+    share its result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                # The fetch is taking too long; do not queue behind it
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Async counterpart of SingleFlight for one process: coroutines asking for
+    a key already being fetched on the same event loop await the same task.
+    The task is shielded, so a client that disconnects does not cancel the
+    fetch for everyone else.
+    """
+
+    def __init__(self):
+        self._tasks = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, fn):
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(tasks, key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, tasks, key, task):
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+
+class FileLockFlight:
+    """
+    Coalesce fetches across the worker processes of one machine with file
+    locks under ``directory``. The first worker to take the lock fetches;
+    the others wait for it and then find the result in a shared local cache
+    (the media hot tier). Waiters give up after ``timeout`` seconds and
+    fetch anyway.
+
+    Keys are hashed onto a fixed pool of ``slots`` lock files, so the
+    directory never grows; unrelated keys that share a slot only wait for
+    each other's fetch.
+    """
+
+    def __init__(self, directory, timeout=10, slots=256):
+        self.directory = directory
+        self.timeout = timeout
+        self.slots = slots
+        os.makedirs(directory, exist_ok=True)
+
+    def _lock_path(self, key):
+        slot = int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % self.slots
+        return os.path.join(self.directory, f'slot-{slot:03d}.lock')
+
+    def acquire(self, key):
+        """
+        Wait for the lock on ``key``. Returns a handle for release(), or
+        None when locking is unavailable or timed out.
+        """
+        if not fcntl:
+            return None
+
+        fd = os.open(self._lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    print(f"Timed out waiting for the media fetch lock on {key}")
+                    os.close(fd)
+                    return None
+                time.sleep(0.01)
+
+    def release(self, handle):
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            os.close(handle)
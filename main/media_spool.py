@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from django.conf import settings
+
+
+class MediaSpool:
+    """
+    Durable write-behind spool for media uploads.
+
+    Files are written to a local directory and a background drainer pushes
+    them to the storage backend with retries. Each entry is one ``.entry``
+    file, keyed by a hash of the media path: a JSON header line followed by
+    the file bytes. Entries move between these subdirectories with a single
+    rename, so data and metadata always travel together:
+
+        pending/   waiting to be uploaded (a newer write replaces the older one)
+        inflight/  claimed by a drainer; returned to pending if it goes stale
+        failed/    gave up after ``max_attempts`` uploads
+
+    Uploaded entries are deleted. An entry is written to a temporary file
+    and renamed into place, so it only exists once fully on disk; a crash
+    or restart simply resumes from pending.
+    """
+
+    def __init__(self, directory, uploader, remover=None, max_attempts=8,
+                 retry_delay=5, poll_interval=5, stale_after=300):
+        self.directory = directory
+        self.uploader = uploader
+        self.remover = remover
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._wakeup = threading.Event()
+        self._drainer = None
+        self._drainer_pid = None
+        self._lock = threading.Lock()
+
+        for state in ('pending', 'inflight', 'failed'):
+            os.makedirs(os.path.join(directory, state), exist_ok=True)
+
+    def _key(self, path):
+        return hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, state, key):
+        return os.path.join(self.directory, state, key + '.entry')
+
+    def _keys(self, state):
+        return [name[:-len('.entry')] for name in os.listdir(os.path.join(self.directory, state))
+                if name.endswith('.entry')]
+
+    def _write_entry(self, target, meta, file_bytes):
+        """
+        Write an entry to a temporary file next to ``target`` and return its
+        path, ready to be renamed into place.
+        """
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(json.dumps(meta).encode('utf-8') + b'\n')
+            tmp_file.write(file_bytes)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        return tmp_path
+
+    def _read_entry(self, state, key, with_data=True):
+        try:
+            with open(self._entry_path(state, key), 'rb') as entry_file:
+                meta = json.loads(entry_file.readline())
+                return (entry_file.read() if with_data else None), meta
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read_meta(self, state, key):
+        entry = self._read_entry(state, key, with_data=False)
+        return entry[1] if entry else None
+
+    def _move_unless_exists(self, source, target):
+        """
+        Rename ``source`` to ``target`` unless ``target`` exists, in which
+        case ``source`` is dropped: a newer write always wins. Returns True
+        if the entry was moved.
+        """
+        try:
+            # link() fails instead of replacing, unlike rename()
+            os.link(source, target)
+        except FileExistsError:
+            os.remove(source)
+            return False
+        os.remove(source)
+        return True
+
+    def get_metadata(self, path):
+        """
+        Return the metadata of a file that has not been flushed yet.
+        """
+        key = self._key(path)
+        for state in ('pending', 'inflight'):
+            meta = self._read_meta(state, key)
+            if meta and meta['path'] == path:
+                return meta
+        return None
+
+    def spool(self, path, file_bytes, content_type, filename):
+        """
+        Durably record a file for upload and wake the drainer.
+        """
+        target = self._entry_path('pending', self._key(path))
+        meta = {
+            'path': path,
+            'content_type': content_type,
+            'name': filename,
+            'size': len(file_bytes),
+            'sha256': hashlib.sha256(file_bytes).hexdigest(),
+            'spooled_at': time.time(),
+            'attempts': 0,
+            'next_attempt_at': 0,
+        }
+        os.replace(self._write_entry(target, meta, file_bytes), target)
+
+        self.ensure_drainer()
+        self._wakeup.set()
+
+    def get(self, path):
+        """
+        Return (bytes, metadata) for a file that has not been flushed yet.
+        """
+        key = self._key(path)
+        for state in ('pending', 'inflight'):
+            entry = self._read_entry(state, key)
+            if entry and entry[1]['path'] == path:
+                return entry
+        return None
+
+    def discard(self, path):
+        """
+        Drop an unflushed upload because the file was deleted. An upload that
+        is in flight right now is undone by the drainer once it finishes.
+        """
+        key = self._key(path)
+        for state in ('pending', 'inflight'):
+            try:
+                os.remove(self._entry_path(state, key))
+            except FileNotFoundError:
+                pass
+
+    def ensure_drainer(self):
+        """
+        Start the background drainer thread for this process if needed.
+        """
+        pid = os.getpid()
+        if self._drainer is not None and self._drainer_pid == pid and self._drainer.is_alive():
+            return
+
+        with self._lock:
+            if self._drainer is not None and self._drainer_pid == pid and self._drainer.is_alive():
+                return
+            self._drainer_pid = pid
+            self._drainer = threading.Thread(target=self._drain_forever, name='media-spool-drainer', daemon=True)
+            self._drainer.start()
+
+    def _drain_forever(self):
+        while True:
+            try:
+                self.requeue_stale()
+                self.drain()
+            except Exception as e:
+                print(f"Error draining media spool: {str(e)}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def requeue_stale(self):
+        """
+        Return entries claimed by a drainer that died (crash, restart) to pending.
+        """
+        now = time.time()
+        for key in self._keys('inflight'):
+            entry_path = self._entry_path('inflight', key)
+            try:
+                if now - os.path.getmtime(entry_path) < self.stale_after:
+                    continue
+                # Never clobber a newer write that arrived while it was in flight
+                self._move_unless_exists(entry_path, self._entry_path('pending', key))
+            except FileNotFoundError:
+                continue
+
+    def requeue_failed(self):
+        """
+        Move uploads that exhausted their retries back to pending.
+        """
+        requeued = 0
+        for key in self._keys('failed'):
+            entry = self._read_entry('failed', key)
+            if entry is None:
+                continue
+            file_bytes, meta = entry
+            meta.update({'attempts': 0, 'next_attempt_at': 0})
+
+            failed_path = self._entry_path('failed', key)
+            tmp_path = self._write_entry(failed_path, meta, file_bytes)
+            if self._move_unless_exists(tmp_path, self._entry_path('pending', key)):
+                requeued += 1
+            try:
+                os.remove(failed_path)
+            except FileNotFoundError:
+                pass
+        return requeued
+
+    def drain(self):
+        """
+        Upload every pending entry that is due. Returns the number flushed.
+        """
+        flushed = 0
+        now = time.time()
+
+        def spooled_at(key):
+            try:
+                return os.path.getmtime(self._entry_path('pending', key))
+            except FileNotFoundError:
+                return now
+
+        # Oldest first, so files are flushed in the order they were written
+        for key in sorted(self._keys('pending'), key=spooled_at):
+            meta = self._read_meta('pending', key)
+            if not meta or meta.get('next_attempt_at', 0) > now:
+                continue
+
+            # Claim the entry; another process may have beaten us to it
+            if os.path.exists(self._entry_path('inflight', key)) or not self._claim(key):
+                continue
+
+            if self._upload(key):
+                flushed += 1
+        return flushed
+
+    def _claim(self, key):
+        inflight_path = self._entry_path('inflight', key)
+        try:
+            os.replace(self._entry_path('pending', key), inflight_path)
+        except FileNotFoundError:
+            return False
+        # Mark the claim time so requeue_stale knows the entry is alive
+        os.utime(inflight_path)
+        return True
+
+    def _upload(self, key):
+        entry = self._read_entry('inflight', key)
+        if not entry:
+            return False
+        file_bytes, meta = entry
+
+        try:
+            uploaded = self.uploader(file_bytes, meta['path'], meta['content_type'], meta['name'])
+        except Exception as e:
+            print(f"Error uploading spooled file {meta['path']}: {str(e)}")
+            uploaded = False
+
+        inflight_path = self._entry_path('inflight', key)
+        if not os.path.exists(inflight_path):
+            # Discarded while uploading: the file was deleted meanwhile
+            if uploaded and self.remover:
+                self.remover(meta['path'])
+            return False
+
+        if uploaded:
+            os.remove(inflight_path)
+            print(f"Flushed spooled file {meta['path']}")
+            return True
+
+        meta['attempts'] += 1
+        if meta['attempts'] >= self.max_attempts:
+            target_state = 'failed'
+            print(f"Giving up on spooled file {meta['path']} after {meta['attempts']} attempts")
+        else:
+            target_state = 'pending'
+            meta['next_attempt_at'] = time.time() + self.retry_delay * (2 ** (meta['attempts'] - 1))
+
+        # The inflight entry is only removed once its successor is in place
+        tmp_path = self._write_entry(inflight_path, meta, file_bytes)
+        if target_state == 'pending':
+            # A newer version spooled meanwhile supersedes this one
+            self._move_unless_exists(tmp_path, self._entry_path('pending', key))
+        elif os.path.exists(self._entry_path('pending', key)):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, self._entry_path('failed', key))
+        os.remove(inflight_path)
+        return False
+
+
+_media_spool = None
+_media_spool_lock = threading.Lock()
+_media_spool_refused = False
+
+# Set on platforms that freeze or discard an instance, with its local disk
+# and the drainer thread, between requests
+SERVERLESS_ENV_VARS = ('VERCEL', 'AWS_LAMBDA_FUNCTION_NAME', 'FUNCTION_TARGET', 'K_SERVICE')
+
+# Usually tmpfs or cleared on reboot
+TEMPORARY_DIRS = ('/tmp', '/var/tmp', '/dev/shm', '/run')
+
+
+def is_write_behind_enabled():
+    return getattr(settings, 'MEDIA_WRITE_BEHIND', False)
+
+
+def spool_durability_problem(directory):
+    """
+    Return why files spooled to ``directory`` could be lost after the upload
+    was acknowledged, or None if the spool is safe to use.
+    """
+    for name in SERVERLESS_ENV_VARS:
+        if os.environ.get(name):
+            return f"running on a serverless platform ({name} is set)"
+
+    directory = os.path.realpath(directory)
+    for temporary_dir in set(TEMPORARY_DIRS + (tempfile.gettempdir(),)):
+        temporary_dir = os.path.realpath(temporary_dir)
+        if directory == temporary_dir or directory.startswith(temporary_dir + os.sep):
+            return f"{directory} is a temporary directory"
+    return None
+
+
+def get_media_spool():
+    """
+    Return the process-wide media spool, or None if write-behind is disabled
+    or MEDIA_SPOOL_DIR is not durable (see spool_durability_problem).
+    The drainer starts as soon as the spool is first used, so entries left
+    over from a previous run are flushed without waiting for a new upload.
+    """
+    global _media_spool, _media_spool_refused
+    if not is_write_behind_enabled() or _media_spool_refused:
+        return None
+
+    if _media_spool is None:
+        with _media_spool_lock:
+            if _media_spool is None and not _media_spool_refused:
+                # Uploads are acknowledged once spooled, so the spool must
+                # outlive the process; otherwise upload synchronously
+                problem = spool_durability_problem(settings.MEDIA_SPOOL_DIR)
+                if problem:
+                    print(f"Write-behind disabled, uploading media synchronously: {problem}")
+                    _media_spool_refused = True
+
+                else:
+                    from .media_backends import get_media_backend
+                    backend = get_media_backend()
+                    _media_spool = MediaSpool(
+                        directory=settings.MEDIA_SPOOL_DIR,
+                        uploader=backend.put,
+                        remover=backend.delete,
+                        max_attempts=getattr(settings, 'MEDIA_SPOOL_MAX_ATTEMPTS', 8),
+                        retry_delay=getattr(settings, 'MEDIA_SPOOL_RETRY_DELAY', 5),
+                        poll_interval=getattr(settings, 'MEDIA_SPOOL_POLL_INTERVAL', 5),
+                    )
+        if _media_spool is None:
+            return None
+    _media_spool.ensure_drainer()
+    return _media_spool
@@ -0,0 +1,196 @@
+import os
+import mimetypes
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+from django.core.files.storage import Storage
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.utils.deconstruct import deconstructible
+from .media_backends import get_media_backend, normalize_media_path
+from .media_cache import get_media_cache
+from .media_negative_cache import forget_missing_media
+from .media_spool import get_media_spool
+from .media_versions import (
+    is_versioning_enabled,
+    get_media_version,
+    invalidate_media_version,
+    versioned_media_url
+)
+
+@deconstructible
+class MediaBackendStorage(Storage):
+    """
+    Django storage backend that keeps media files in the backend selected by
+    the MEDIA_BACKEND setting (Firestore, in-memory or local disk). Files are
+    served back by the serve_media_file view.
+    With MEDIA_WRITE_BEHIND enabled, saves land in a local spool and are
+    uploaded in the background; unflushed files are read from the spool.
+    """
+
+    def __init__(self, location=None, base_url=None):
+        self.location = location or settings.MEDIA_ROOT
+        self.base_url = base_url or settings.MEDIA_URL
+
+    @property
+    def backend(self):
+        """
+        The process-wide media backend shared with serve_media_file.
+        """
+        return get_media_backend()
+
+    def _get_path(self, name):
+        """
+        Get the full path of the file.
+        """
+        return normalize_media_path(name)
+
+    def _open(self, name, mode='rb'):
+        """
+        Retrieve the file from the media backend.
+        """
+        path = self._get_path(name)
+
+        # Files that have not been flushed yet are read from the spool
+        spool = get_media_spool()
+        spooled = spool.get(path) if spool else None
+        if spooled:
+            return ContentFile(spooled[0], name=name)
+
+        try:
+            data = self.backend.read(path)
+        except Exception as e:
+            print(f"Error opening file {name}: {str(e)}")
+            raise FileNotFoundError(f"Cannot open file {name}: {str(e)}")
+
+        if data is None:
+            raise FileNotFoundError(f"File {name} does not exist")
+        return ContentFile(data, name=name)
+
+    def _save(self, name, content):
+        """
+        Save the file to the media backend. The content is handed over as a
+        stream, so large uploads are not read into memory, along with the
+        digest computed by StreamingUploadHandler when there is one. A failed
+        upload raises IOError so the model is not saved pointing at a file
+        that was never written.
+        """
+        path = self._get_path(name)
+        content.seek(0)
+
+        # Get content type
+        content_type, _ = mimetypes.guess_type(name)
+        if not content_type:
+            content_type = 'application/octet-stream'
+
+        # Write-behind: spool locally and let the drainer upload it
+        spool = get_media_spool()
+        if spool:
+            spool.spool(path, content.read(), content_type, os.path.basename(name))
+            get_media_cache().invalidate(path)
+            invalidate_media_version(path)
+            forget_missing_media(path)
+            return name
+
+        result = self.backend.put_stream(
+            content, path, content_type, os.path.basename(name),
+            content.size, getattr(content, 'sha256', None)
+        )
+
+        # Drop any stale copy served by serve_media_file
+        get_media_cache().invalidate(path)
+        invalidate_media_version(path)
+        forget_missing_media(path)
+
+        if not result:
+            raise IOError(f"Error saving file {name}")
+
+        return name
+
+    def delete(self, name):
+        """
+        Delete the file from the media backend.
+        """
+        path = self._get_path(name)
+        spool = get_media_spool()
+        if spool:
+            spool.discard(path)
+        self.backend.delete(path)
+        get_media_cache().invalidate(path)
+        invalidate_media_version(path)
+
+    def exists(self, name):
+        """
+        Check if the file exists in the media backend.
+        """
+        path = self._get_path(name)
+        spool = get_media_spool()
+        if spool and spool.get_metadata(path):
+            return True
+        try:
+            # Django calls this on every save; only fetch the metadata
+            return self.backend.stat(path) is not None
+        except Exception as e:
+            print(f"Error checking if file {name} exists: {str(e)}")
+            # Assume file doesn't exist if there's an error
+            return False
+
+    def url(self, name):
+        """
+        Return URL for accessing the file.
+        Files are served by the serve_media_file view under MEDIA_URL. The
+        URL embeds a content version so it can be cached forever; files
+        without a locally known version get a plain URL, which the view
+        redirects to the versioned one.
+        """
+        path = self._get_path(name)
+        version = get_media_version(path) if is_versioning_enabled() else None
+        return self.versioned_url(name, version)
+
+    def versioned_url(self, name, version):
+        """
+        Return the URL of a file whose version the caller already knows,
+        e.g. from Task.media_versions.
+        """
+        path = self._get_path(name)
+        if version and is_versioning_enabled():
+            return versioned_media_url(path, version, self.base_url)
+        return urljoin(self.base_url, path)
+
+    def _get_metadata(self, name):
+        path = self._get_path(name)
+        spool = get_media_spool()
+        metadata = spool.get_metadata(path) if spool else None
+        if metadata:
+            metadata = dict(metadata, uploaded_at=datetime.fromtimestamp(metadata['spooled_at'], tz=timezone.utc))
+        else:
+            metadata = self.backend.stat(path)
+
+        if not metadata:
+            raise FileNotFoundError(f"File {name} does not exist")
+        return metadata
+
+    def size(self, name):
+        """
+        Return the size of the file.
+        """
+        return self._get_metadata(name)['size']
+
+    def get_accessed_time(self, name):
+        """
+        Return the last accessed time of the file.
+        Not tracked by the media backends.
+        """
+        raise NotImplementedError("Media backends don't track access time")
+
+    def get_created_time(self, name):
+        """
+        Return the creation time of the file.
+        """
+        return self._get_metadata(name)['uploaded_at']
+
+    def get_modified_time(self, name):
+        """
+        Return the last modified time of the file.
+        Same as creation time for the media backends.
+        """
+        return self.get_created_time(name)
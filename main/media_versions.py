@@ -0,0 +1,85 @@
+import hashlib
+from django.conf import settings
+from .media_negative_cache import get_media_metadata_cache
+from .media_spool import get_media_spool
+
+# Length of the digest prefix embedded in versioned media URLs
+MEDIA_VERSION_LENGTH = 16
+
+# Prefix of versioned media URLs: <MEDIA_URL>_v/<version>/<path>
+MEDIA_VERSION_PREFIX = '_v'
+
+# The current version of each file is kept in the MEDIA_METADATA_CACHE
+# alias. Saving or deleting a file clears it, which every worker sees when
+# that cache is shared; the media view also uses it to tell whether its
+# in-process copy of a file is still current.
+
+
+def is_versioning_enabled():
+    return getattr(settings, 'MEDIA_VERSIONED_URLS', True)
+
+
+def media_version(sha256):
+    """
+    Turn a content digest into the version embedded in media URLs.
+    """
+    return sha256[:MEDIA_VERSION_LENGTH] if sha256 else None
+
+
+def versioned_media_url(path, version, base_url=None):
+    base_url = base_url or settings.MEDIA_URL
+    return f"{base_url}{MEDIA_VERSION_PREFIX}/{version}/{path}"
+
+
+def _version_cache_key(path):
+    # Media paths can be longer than memcached allows and contain spaces
+    return 'media-version:' + hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+
+def remember_media_version(path, sha256):
+    get_media_metadata_cache().set(
+        _version_cache_key(path),
+        media_version(sha256) or '',
+        getattr(settings, 'MEDIA_VERSION_CACHE_TTL', 3600)
+    )
+
+
+def invalidate_media_version(path):
+    get_media_metadata_cache().delete(_version_cache_key(path))
+
+
+def file_media_version(content):
+    """
+    Return the version of an uploaded or generated file, using the digest
+    StreamingUploadHandler already computed when there is one.
+    """
+    sha256 = getattr(content, 'sha256', None)
+    if not sha256:
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        sha256 = digest.hexdigest()
+    return media_version(sha256)
+
+
+def get_media_version(path):
+    """
+    Return the version of a media file if it is known locally: cached by
+    the media view, or from the write-behind spool. Never asks the media
+    backend, so rendering a page of media URLs costs no round trips. Files
+    whose version is recorded elsewhere (Task.media_versions) pass it to
+    MediaBackendStorage.versioned_url instead.
+    """
+    version = get_media_metadata_cache().get(_version_cache_key(path))
+    if version is not None:
+        return version or None
+
+    spool = get_media_spool()
+    metadata = spool.get_metadata(path) if spool else None
+    if not metadata:
+        return None
+
+    remember_media_version(path, metadata.get('sha256'))
+    return media_version(metadata.get('sha256'))
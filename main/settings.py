@@ -37,7 +37,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -146,8 +146,94 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are hashed and inspected as they arrive, kept in memory up to
+# FILE_UPLOAD_MAX_MEMORY_SIZE and spooled to a temporary file beyond that
+FILE_UPLOAD_HANDLERS = ['main.upload_handlers.StreamingUploadHandler']
+
+# Where media files are stored: Firestore in production, or an in-memory /
+# local-disk backend to run and benchmark the media path without Firestore.
+# MEDIA_BACKEND_LATENCY adds a delay (seconds) to each local round trip.
+MEDIA_BACKEND = os.environ.get('MEDIA_BACKEND', 'main.media_backends.FirestoreBackend')
+MEDIA_BACKEND_LOCATION = os.environ.get('MEDIA_BACKEND_LOCATION', os.path.join(BASE_DIR, 'media_backend'))
+MEDIA_BACKEND_LATENCY = float(os.environ.get('MEDIA_BACKEND_LATENCY', 0))
+
+# Serve media with the async view and the async Firestore client. Only
+# enable this under ASGI (e.g. gunicorn -k uvicorn.workers.UvicornWorker
+# main.asgi); under WSGI every request would start its own event loop
+MEDIA_ASYNC_VIEW = os.environ.get('MEDIA_ASYNC_VIEW') == 'True'
+
+# Local-disk hot tier in front of MEDIA_BACKEND, shared by the workers of
+# one machine (use a /tmp path on serverless); empty disables it
+MEDIA_HOT_TIER_DIR = os.environ.get('MEDIA_HOT_TIER_DIR', '')
+MEDIA_HOT_TIER_MAX_BYTES = int(os.environ.get('MEDIA_HOT_TIER_MAX_BYTES', 256 * 1024 * 1024))
+# Hot copies are checked against the backend (metadata only) once they are
+# this old, so deletes and overwrites from other machines show up (seconds)
+MEDIA_HOT_TIER_REVALIDATE_AFTER = int(os.environ.get('MEDIA_HOT_TIER_REVALIDATE_AFTER', 60))
+
+# Concurrent requests for the same uncached media file share one backend
+# fetch. With MEDIA_SINGLE_FLIGHT_CROSS_WORKER (needs MEDIA_HOT_TIER_DIR)
+# the workers of a machine also wait on a lock file for the first fetch;
+# waiters give up after MEDIA_SINGLE_FLIGHT_TIMEOUT and fetch themselves
+MEDIA_SINGLE_FLIGHT = os.environ.get('MEDIA_SINGLE_FLIGHT', 'True') == 'True'
+MEDIA_SINGLE_FLIGHT_CROSS_WORKER = os.environ.get('MEDIA_SINGLE_FLIGHT_CROSS_WORKER') == 'True'
+MEDIA_SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('MEDIA_SINGLE_FLIGHT_TIMEOUT', 10))  # seconds
+
+# serve_media_file remembers missing paths for this long (seconds), so
+# repeated 404s skip the backend; saving a file clears the entry. 0 disables.
+# Capped at 10s while the media metadata cache is per process (LocMemCache)
+MEDIA_NEGATIVE_CACHE_TTL = int(os.environ.get('MEDIA_NEGATIVE_CACHE_TTL', 60))
+
+# In-process LRU cache for decoded media served by serve_media_file
+# Set MEDIA_CACHE_MAX_BYTES=0 to disable it. A copy is only served while its
+# version matches the one in the media metadata cache; while that cache is
+# per process, other workers can serve an overwritten file's old bytes for
+# up to MEDIA_CACHE_TTL
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get('MEDIA_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+MEDIA_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('MEDIA_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+MEDIA_CACHE_TTL = int(os.environ.get('MEDIA_CACHE_TTL', 300))  # seconds
+
+# Media URLs embed a content version and are served as immutable for a
+# year; the version of each file is cached in the media metadata cache
+# for MEDIA_VERSION_CACHE_TTL
+MEDIA_VERSIONED_URLS = os.environ.get('MEDIA_VERSIONED_URLS', 'True') == 'True'
+MEDIA_VERSION_CACHE_TTL = int(os.environ.get('MEDIA_VERSION_CACHE_TTL', 3600))  # seconds
+
+# Files larger than this are stored in Firestore as a manifest plus chunk
+# documents; keep it well under Firestore's 1 MiB document limit
+MEDIA_CHUNK_SIZE = int(os.environ.get('MEDIA_CHUNK_SIZE', 768 * 1024))
+
+# Store each distinct file once under its SHA-256 digest, with per-path
+# reference documents, so identical uploads are not written again
+MEDIA_CONTENT_ADDRESSED = os.environ.get('MEDIA_CONTENT_ADDRESSED') == 'True'
+
+# Write-behind uploads: files land in a local spool and a background thread
+# pushes them to Firestore with retries. Uploads are acknowledged once
+# spooled, so MEDIA_SPOOL_DIR must be on persistent disk and the workers
+# long-running; write-behind turns itself off on serverless platforms and
+# for temporary directories
+MEDIA_WRITE_BEHIND = os.environ.get('MEDIA_WRITE_BEHIND') == 'True'
+MEDIA_SPOOL_DIR = os.environ.get('MEDIA_SPOOL_DIR', os.path.join(BASE_DIR, 'media_spool'))
+MEDIA_SPOOL_MAX_ATTEMPTS = int(os.environ.get('MEDIA_SPOOL_MAX_ATTEMPTS', 8))
+MEDIA_SPOOL_RETRY_DELAY = int(os.environ.get('MEDIA_SPOOL_RETRY_DELAY', 5))  # seconds, doubled per attempt
+MEDIA_SPOOL_POLL_INTERVAL = int(os.environ.get('MEDIA_SPOOL_POLL_INTERVAL', 5))  # seconds
+
+# Resized copies generated for each task logo at upload time
+LOGO_VARIANT_SIZES = [80, 160, 320]
+LOGO_FALLBACK_FORMAT = 'PNG'  # served to browsers without WebP support
+LOGO_VARIANT_QUALITY = 85
+
+# Proof screenshots are downscaled and recompressed before they are stored
+SCREENSHOT_PROCESSING = os.environ.get('SCREENSHOT_PROCESSING', 'True') == 'True'
+SCREENSHOT_MAX_DIMENSION = int(os.environ.get('SCREENSHOT_MAX_DIMENSION', 1600))
+SCREENSHOT_FORMAT = os.environ.get('SCREENSHOT_FORMAT', 'JPEG')  # JPEG, WEBP or PNG
+SCREENSHOT_QUALITY = int(os.environ.get('SCREENSHOT_QUALITY', 75))
+
 # Firebase Storage settings
-if not DEBUG or os.environ.get('USE_FIREBASE_STORAGE') == 'True':
+if MEDIA_BACKEND != 'main.media_backends.FirestoreBackend':
+    # Local media backends need no Firebase credentials
+    DEFAULT_FILE_STORAGE = 'main.media_storage.MediaBackendStorage'
+    print(f"Using {MEDIA_BACKEND} for media storage")
+elif not DEBUG or os.environ.get('USE_FIREBASE_STORAGE') == 'True':
     try:
         # Try to import and initialize Firebase
         from main.firebase_firestore_config import initialize_firebase
@@ -165,4 +251,45 @@ if not DEBUG or os.environ.get('USE_FIREBASE_STORAGE') == 'True':
         # Firebase initialization failed, use default storage
         pass
 
+# Caches: the task catalogue (list pages and rendered task cards) and the
+# per-user completed task IDs have their own alias so they can live in a
+# shared backend, e.g.
+# CATALOGUE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CATALOGUE_CACHE_LOCATION=redis://127.0.0.1:6379/1
+# So does the media metadata (missing paths), through
+# MEDIA_METADATA_CACHE_BACKEND and MEDIA_METADATA_CACHE_LOCATION
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        'BACKEND': os.environ.get('CATALOGUE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CATALOGUE_CACHE_LOCATION', 'catalogue'),
+    },
+    'media': {
+        'BACKEND': os.environ.get('MEDIA_METADATA_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('MEDIA_METADATA_CACHE_LOCATION', 'media'),
+    },
+}
+CATALOGUE_CACHE = 'catalogue'
+MEDIA_METADATA_CACHE = 'media'
+CATALOGUE_CACHE_TTL = int(os.environ.get('CATALOGUE_CACHE_TTL', 300))  # seconds
+
+# Each process keeps the category/subcategory taxonomy in memory and checks
+# for edits made by other processes at most this often (seconds)
+TAXONOMY_CHECK_INTERVAL = int(os.environ.get('TAXONOMY_CHECK_INTERVAL', 30))
+
+# Task search (authentication.search) returns at most this many matches;
+# results are cached with the catalogue pages
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 200))
+
+# List pages show an approximate total; off PostgreSQL it is an exact
+# COUNT(*) cached for this many seconds
+APPROXIMATE_COUNT_CACHE_TTL = int(os.environ.get('APPROXIMATE_COUNT_CACHE_TTL', 60))
+
+# How long the per-user set of completed task IDs stays cached in the
+# catalogue cache (seconds); completing a task clears it. Capped at 30s
+# while that cache is per process (LocMemCache)
+COMPLETED_TASKS_CACHE_TTL = int(os.environ.get('COMPLETED_TASKS_CACHE_TTL', 3600))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,52 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+def _srcset(task, sizes):
+    return format_html_join(
+        ', ', '{} {}w',
+        ((task.media_url(name), size) for size, name in sorted(sizes.items(), key=lambda item: int(item[0])))
+    )
+
+
+@register.simple_tag
+def logo_picture(task, display_size=80, css_class='', alt=None):
+    """
+    Render a task logo using its resized variants, so the browser picks the
+    smallest file that fits the box (WebP when supported).
+    Usage: {% logo_picture task 80 "h-20 w-20 object-contain" %}
+    Tasks without variants fall back to the original logo.
+    """
+    alt = task.name if alt is None else alt
+    variants = task.logo_variants or {}
+
+    fallback_format = next((fmt for fmt in variants if fmt != 'webp'), None)
+    if not fallback_format:
+        return format_html('<img src="{}" alt="{}" class="{}">', task.logo_url, alt, css_class)
+
+    fallback = variants[fallback_format]
+    # Smallest fallback at least as large as the box, else the largest one
+    src_size = min(
+        (size for size in fallback if int(size) >= int(display_size)),
+        key=int,
+        default=max(fallback, key=int)
+    )
+
+    webp_source = ''
+    if variants.get('webp'):
+        webp_source = format_html(
+            '<source type="image/webp" srcset="{}" sizes="{}px">',
+            _srcset(task, variants['webp']), display_size
+        )
+
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}px" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="lazy"></picture>',
+        webp_source,
+        task.media_url(fallback[src_size]),
+        _srcset(task, fallback),
+        display_size, display_size, display_size,
+        alt, css_class
+    )
@@ -0,0 +1,104 @@
+import os
+import hashlib
+from io import BytesIO
+from PIL import ImageFile
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+
+# Only this much of the start of a file is fed to Pillow to read its header
+IMAGE_HEADER_MAX_BYTES = 64 * 1024
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Upload handler that inspects each file while the request body arrives.
+
+    The SHA-256 digest, size and image header (format, width, height) are
+    computed chunk by chunk. The data is kept in memory up to
+    FILE_UPLOAD_MAX_MEMORY_SIZE, then moved to a temporary file on disk.
+    Either way, memory per upload stays bounded by that threshold.
+
+    The returned file carries ``sha256`` and ``image_info`` attributes, so
+    forms and the storage backend need not read it again to get them.
+    Replaces both of Django's default handlers in FILE_UPLOAD_HANDLERS.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.buffer = BytesIO()
+        self.temporary_file = None
+        self.digest = hashlib.sha256()
+        self.image_parser = ImageFile.Parser()
+        self.image_info = None
+        self.header_bytes = 0
+        raise StopFutureHandlers()
+
+    def _read_image_header(self, raw_data):
+        if self.image_parser is None:
+            return
+
+        try:
+            self.image_parser.feed(raw_data[:IMAGE_HEADER_MAX_BYTES - self.header_bytes])
+        except Exception:
+            # Not an image Pillow understands; form validation will say so
+            self.image_parser = None
+            return
+
+        self.header_bytes += len(raw_data)
+        image = self.image_parser.image
+        if image is not None:
+            self.image_info = {
+                'format': image.format,
+                'width': image.width,
+                'height': image.height,
+            }
+        if image is not None or self.header_bytes >= IMAGE_HEADER_MAX_BYTES:
+            # Stop before Pillow starts decoding pixel data
+            self.image_parser = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        self._read_image_header(raw_data)
+
+        if self.temporary_file is None and start + len(raw_data) > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            # Past the in-memory threshold: move what we have to disk
+            self.temporary_file = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+            )
+            self.temporary_file.write(self.buffer.getvalue())
+            self.buffer = None
+
+        if self.temporary_file is not None:
+            self.temporary_file.write(raw_data)
+        else:
+            self.buffer.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.temporary_file is not None:
+            uploaded_file = self.temporary_file
+            uploaded_file.size = file_size
+        else:
+            uploaded_file = InMemoryUploadedFile(
+                file=self.buffer,
+                field_name=self.field_name,
+                name=self.file_name,
+                content_type=self.content_type,
+                size=file_size,
+                charset=self.charset,
+                content_type_extra=self.content_type_extra,
+            )
+
+        uploaded_file.seek(0)
+        uploaded_file.sha256 = self.digest.hexdigest()
+        uploaded_file.image_info = self.image_info
+        return uploaded_file
+
+    def upload_interrupted(self):
+        if getattr(self, 'temporary_file', None) is not None:
+            temp_location = self.temporary_file.temporary_file_path()
+            try:
+                self.temporary_file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
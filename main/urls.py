@@ -4,7 +4,10 @@ from authentication.views import index
 from django.views.generic.base import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import health_check, serve_media_file
+from .views import health_check, serve_media_file, serve_media_file_async
+
+# The async media view only pays off under ASGI (see MEDIA_ASYNC_VIEW)
+media_view = serve_media_file_async if settings.MEDIA_ASYNC_VIEW else serve_media_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,7 +16,8 @@ urlpatterns = [
     path("", TemplateView.as_view(template_name="home.html"), name="home"),
     path("health/", health_check, name="health_check"),
     # Serve media files from Firebase Realtime Database
-    re_path(r'^media/(?P<path>.*)$', serve_media_file, name='serve_media_file'),
+    re_path(r'^media/_v/(?P<version>[0-9a-f]+)/(?P<path>.*)$', media_view, name='serve_versioned_media_file'),
+    re_path(r'^media/(?P<path>.*)$', media_view, name='serve_media_file'),
 ]
 
 
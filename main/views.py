@@ -1,9 +1,31 @@
-from django.http import HttpResponse, Http404
+import re
+from calendar import timegm
+from asgiref.sync import sync_to_async
+from django.http import (
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+    Http404
+)
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.cache import cache_control
-import base64
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 
-from .firebase_firestore_config import get_file_from_firestore
+from .media_backends import get_media_backend, normalize_media_path
+from .media_cache import get_media_cache
+from .media_negative_cache import is_media_missing, remember_missing_media
+from .media_spool import get_media_spool
+from .media_versions import (
+    get_media_version,
+    invalidate_media_version,
+    is_versioning_enabled,
+    media_version,
+    remember_media_version,
+    versioned_media_url
+)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 def health_check(request):
     """
@@ -11,43 +33,346 @@ def health_check(request):
     """
     return HttpResponse("OK")
 
+def _last_modified_timestamp(file_data):
+    """
+    Convert the backend's ``uploaded_at`` datetime into a Unix timestamp.
+    """
+    uploaded_at = file_data.get('uploaded_at')
+    if not uploaded_at or not hasattr(uploaded_at, 'utctimetuple'):
+        return None
+    return timegm(uploaded_at.utctimetuple())
+
+def _parse_range(range_header, size):
+    """
+    Parse a single-range ``Range`` header into an inclusive (start, end) pair.
+    Returns None when the header should be ignored and the full body served,
+    and raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(range_header.strip())
+    if not match:
+        # Multiple or malformed ranges; serving the full body is always allowed
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    Check the ``If-Range`` precondition; a Range is only honoured if it holds.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and last_modified is not None and if_range_date >= last_modified
+
+def _media_response(request, content_type, etag, last_modified, size, data=None, stream=None):
+    """
+    Build the response for a media file, honouring ``Range`` requests.
+    Small files are passed in as ``data``; chunked files pass ``stream``, a
+    callable returning an iterator over the bytes between two offsets.
+    """
+    start, end = 0, size - 1
+    status = 200
+    content_range = None
+
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        if byte_range:
+            start, end = byte_range
+            status = 206
+            content_range = f'bytes {start}-{end}/{size}'
+
+    if stream is not None:
+        response = StreamingHttpResponse(stream(start, end), content_type=content_type, status=status)
+        response['Content-Length'] = str(max(end - start + 1, 0))
+    else:
+        if status == 206:
+            data = data[start:end + 1]
+        response = HttpResponse(data, content_type=content_type, status=status)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if content_range:
+        response['Content-Range'] = content_range
+    return response
+
+def _version_redirect(path, version, sha256):
+    """
+    Redirect requests whose URL carries no version, or an outdated one, to
+    the URL of the current content. Returns None when the URL is current.
+    """
+    # Also what tells the in-process copies of the file apart
+    remember_media_version(path, sha256)
+    if not is_versioning_enabled():
+        return None
+
+    current = media_version(sha256)
+    if not current or version == current:
+        return None
+
+    response = HttpResponseRedirect(versioned_media_url(path, current))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def _is_other_version(version, metadata):
+    """
+    True when the URL names a version other than the one ``metadata``
+    describes, which may come from an outdated local copy.
+    """
+    return bool(version and metadata and metadata.get('sha256') and version != media_version(metadata['sha256']))
+
+def _drop_local_copies(path):
+    """
+    Forget the copies of ``path`` held by this worker and machine, and
+    return its metadata from the media backend itself. Done before
+    redirecting a versioned URL, so a worker still holding the old bytes
+    never sends a request for the new version back to the old one.
+    """
+    get_media_cache().invalidate(path)
+    invalidate_media_version(path)
+    return get_media_backend().stat_fresh(path)
+
+def _set_cache_control(response, version):
+    if response.status_code in (200, 206, 304):
+        if version:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=86400'  # 24 hours
+    return response
+
+def _serve_locally(request, path, version):
+    """
+    Answer from the in-process cache or the write-behind spool; returns
+    None when the file has to come from the media backend.
+    """
+    # Serve from the in-process cache when possible. Only other workers
+    # see a save here through the version in the media metadata cache, so
+    # a copy whose version is no longer current is dropped
+    media_cache = get_media_cache()
+    cached = media_cache.get(path)
+    if cached and get_media_version(path) != media_version(cached['sha256']):
+        media_cache.invalidate(path)
+        cached = None
+    if cached and _is_other_version(version, cached):
+        # Let the backend decide which version is current
+        cached = None
+    if cached:
+        redirect = _version_redirect(path, version, cached['sha256'])
+        if redirect:
+            return redirect
+        not_modified = get_conditional_response(
+            request, etag=cached['etag'], last_modified=cached['last_modified']
+        )
+        if not_modified is not None:
+            return not_modified
+        return _media_response(
+            request, cached['content_type'], cached['etag'],
+            cached['last_modified'], cached['size'], data=cached['data']
+        )
+
+    # Files uploaded in write-behind mode are served from the spool
+    # until the drainer has flushed them. The spool holds the newest save,
+    # so its version is current
+    spool = get_media_spool()
+    spooled = spool.get(path) if spool else None
+    if spooled:
+        data, metadata = spooled
+        redirect = _version_redirect(path, version, metadata['sha256'])
+        if redirect:
+            return redirect
+        etag = quote_etag(metadata['sha256'])
+        last_modified = int(metadata['spooled_at'])
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        return _media_response(
+            request, metadata['content_type'], etag, last_modified, len(data), data=data
+        )
+    return None
+
+def _is_revalidation(request):
+    return bool(request.META.get('HTTP_IF_NONE_MATCH') or request.META.get('HTTP_IF_MODIFIED_SINCE'))
+
+def _revalidate(request, path, version, metadata):
+    """
+    Answer a revalidation request from the file metadata alone; returns
+    None when the payload is needed after all.
+    """
+    if not metadata or not metadata.get('sha256'):
+        return None
+    redirect = _version_redirect(path, version, metadata['sha256'])
+    if redirect:
+        return redirect
+    return get_conditional_response(
+        request,
+        etag=quote_etag(metadata['sha256']),
+        last_modified=_last_modified_timestamp(metadata)
+    )
+
+def _file_response(request, path, version, file_data, stream):
+    """
+    Build the response for a file fetched from the media backend. ``stream``
+    returns an iterator over a byte range, for files without a payload.
+    """
+    if not file_data:
+        # Return a default image or placeholder if available
+        # For now, just raise a 404
+        remember_missing_media(path)
+        raise Http404(f"File not found: {path}")
+
+    redirect = _version_redirect(path, version, file_data['sha256'])
+    if redirect:
+        return redirect
+
+    etag = quote_etag(file_data['sha256'])
+    last_modified = _last_modified_timestamp(file_data)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = file_data.get('content_type', 'application/octet-stream')
+
+    if 'data' not in file_data:
+        # Large files are streamed chunk by chunk so memory stays flat
+        return _media_response(
+            request, content_type, etag, last_modified,
+            file_data.get('size', 0), stream=stream
+        )
+
+    data = file_data['data']
+
+    # Create response with appropriate content type
+    get_media_cache().set(
+        path, data, content_type,
+        etag=etag, last_modified=last_modified, sha256=file_data['sha256']
+    )
+
+    # Add content disposition header for downloads if needed
+    # response['Content-Disposition'] = f'inline; filename="{file_data.get("name", "file")}"'
+
+    return _media_response(
+        request, content_type, etag, last_modified,
+        len(data), data=data
+    )
+
 @require_http_methods(["GET"])
-@cache_control(max_age=86400, public=True)  # Cache for 24 hours
-def serve_media_file(request, path):
+def serve_media_file(request, path, version=None):
     """
-    Serve media files from Firebase Firestore.
-    This view retrieves files stored as base64-encoded strings in Firestore documents
-    and serves them with the appropriate content type.
+    Serve media files from the configured media backend (Firebase Firestore
+    by default) with the appropriate content type. Repeat visits are
+    answered with 304 via ETag/Last-Modified, and Range requests get 206
+    partial content. Files the backend returns without a payload (chunked
+    Firestore documents) are streamed back one chunk at a time.
+
+    URLs from the storage class embed a content version
+    (/media/_v/<version>/<path>); those responses never change and are
+    cached for a year. Unversioned or outdated URLs redirect to the
+    current version. Missing files are remembered for a short while
+    (MEDIA_NEGATIVE_CACHE_TTL) so repeated 404s skip the backend.
     """
+    path = normalize_media_path(path)
     try:
-        # Get file data from Firebase Firestore
-        file_data = get_file_from_firestore(path)
-        
-        if not file_data:
-            # Return a default image or placeholder if available
-            # For now, just raise a 404
-            raise Http404(f"File not found: {path}")
-        
-        if 'data' not in file_data:
-            return HttpResponse(f"Invalid file data format for: {path}", status=500)
-        
-        # Decode base64 data
-        try:
-            decoded_data = base64.b64decode(file_data['data'])
-        except Exception as e:
-            return HttpResponse(f"Error decoding file: {str(e)}", status=500)
-        
-        # Create response with appropriate content type
-        content_type = file_data.get('content_type', 'application/octet-stream')
-        response = HttpResponse(decoded_data, content_type=content_type)
-        
-        # Add cache headers
-        response['Cache-Control'] = 'public, max-age=86400'  # 24 hours
-        
-        # Add content disposition header for downloads if needed
-        # response['Content-Disposition'] = f'inline; filename="{file_data.get("name", "file")}"'
-        
-        return response
+        response = _serve_locally(request, path, version)
+        if response is None:
+            # Paths found missing recently are answered without a backend read
+            if is_media_missing(path):
+                raise Http404(f"File not found: {path}")
+            backend = get_media_backend()
+
+            # Revalidation requests usually end in a 304, so check them
+            # against the metadata alone before downloading the payload
+            if _is_revalidation(request):
+                metadata = backend.stat(path)
+                if _is_other_version(version, metadata):
+                    metadata = _drop_local_copies(path)
+                response = _revalidate(request, path, version, metadata)
+
+            if response is None:
+                file_data = backend.get(path)
+                if _is_other_version(version, file_data):
+                    # Read it again once outdated local copies are gone
+                    _drop_local_copies(path)
+                    file_data = backend.get(path)
+                response = _file_response(
+                    request, path, version, file_data,
+                    lambda start, end: backend.iter_range(path, file_data, start, end)
+                )
+    except Http404:
+        raise
     except Exception as e:
         print(f"Error serving media file {path}: {str(e)}")
         return HttpResponse(f"Server error: Unable to retrieve file", status=500)
+
+    return _set_cache_control(response, version)
+
+async def serve_media_file_async(request, path, version=None):
+    """
+    Async variant of serve_media_file for ASGI deployments, enabled with
+    MEDIA_ASYNC_VIEW. Backend reads await the async Firestore client, so a
+    worker serves many media requests concurrently without a thread each;
+    chunked files are streamed with an async iterator.
+
+    The local steps (spool reads, cache lookups and writes) block, so they
+    run in worker threads rather than on the event loop.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    path = normalize_media_path(path)
+    try:
+        response = await sync_to_async(_serve_locally, thread_sensitive=False)(request, path, version)
+        if response is None:
+            if await sync_to_async(is_media_missing, thread_sensitive=False)(path):
+                raise Http404(f"File not found: {path}")
+            backend = get_media_backend()
+
+            if _is_revalidation(request):
+                metadata = await backend.astat(path)
+                if _is_other_version(version, metadata):
+                    metadata = await sync_to_async(_drop_local_copies, thread_sensitive=False)(path)
+                response = await sync_to_async(_revalidate, thread_sensitive=False)(
+                    request, path, version, metadata
+                )
+
+            if response is None:
+                file_data = await backend.aget(path)
+                if _is_other_version(version, file_data):
+                    await sync_to_async(_drop_local_copies, thread_sensitive=False)(path)
+                    file_data = await backend.aget(path)
+                response = await sync_to_async(_file_response, thread_sensitive=False)(
+                    request, path, version, file_data,
+                    lambda start, end: backend.aiter_range(path, file_data, start, end)
+                )
+    except Http404:
+        raise
+    except Exception as e:
+        print(f"Error serving media file {path}: {str(e)}")
+        return HttpResponse("Server error: Unable to retrieve file", status=500)
+
+    return _set_cache_control(response, version)